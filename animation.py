@@ -1,46 +1,58 @@
-import os
-import pygame
+import bisect
+import weakref
+from asset_manager import assets
 import utils
 
 
+class AnimationClock:
+    def __init__(self):
+        self.now_ms = 0
+        self.animations = weakref.WeakSet()
+
+    def add(self, animation):
+        self.animations.add(animation)
+
+    def reset(self):
+        self.now_ms = 0
+        for animation in list(self.animations):
+            animation.reset()
+
+    def tick(self, delta_ms):
+        # Every animation advances once per tick, however many read it
+        self.now_ms += delta_ms
+        for animation in list(self.animations):
+            animation.advance(delta_ms)
+
+
+animation_clock = AnimationClock()
+
+
 class Animation:
-    def __init__(self, path):
-        with open(os.path.join(utils.get_resource_path(), path), "r") as f:
-            text = f.read()
-        header_data, data = utils.parse_dat(text)
+    def __init__(self, path, clock=animation_clock):
+        header_data, data = utils.parse_dat(assets.text(path))
         self.is_loop = header_data["is_loop"] == "1"
 
-        self.frame_idx = 0
-        self.frames = []
+        # Frames end at cumulative times, so the current frame is a bisect
+        self.tile_idxs = []
+        self.end_ms = []
+        total_ms = 0
         for l in data:
             d = l.split(":")
-            self.frames.append({
-                "tile_idx": int(d[0]),
-                "delay_ms": int(d[1]),
-            })
-        self.last_ms = None
-        self.frame_idx = 0
-        self.acc_ms = 0
+            total_ms += int(d[1])
+            self.tile_idxs.append(int(d[0]))
+            self.end_ms.append(total_ms)
+        self.total_ms = total_ms
+        self.elapsed_ms = 0
+        clock.add(self)
 
     def reset(self):
-        self.last_ms = pygame.time.get_ticks()
-        self.acc_ms = 0
-
-    def update(self):
-        now = pygame.time.get_ticks()
-        if self.last_ms == None:
-            self.last_ms = now
-        self.acc_ms += now - self.last_ms
-        self.last_ms = now
-
-        frame = self.frames[self.frame_idx]
-        while self.acc_ms > frame["delay_ms"]:
-            self.acc_ms -= frame["delay_ms"]
-            if self.is_loop:
-                self.frame_idx = (self.frame_idx + 1) % len(self.frames)
-            else:
-                self.frame_idx = len(self.frames) - 1
+        self.elapsed_ms = 0
+
+    def advance(self, delta_ms):
+        self.elapsed_ms += delta_ms
+        if self.is_loop and self.total_ms > 0:
+            self.elapsed_ms %= self.total_ms
 
     def get_current_tile_idx(self):
-        frame = self.frames[self.frame_idx]
-        return frame["tile_idx"]
+        frame_idx = bisect.bisect_left(self.end_ms, self.elapsed_ms)
+        return self.tile_idxs[min(frame_idx, len(self.tile_idxs) - 1)]
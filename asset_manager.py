@@ -0,0 +1,118 @@
+import os
+import io
+import threading
+from concurrent.futures import Future, ThreadPoolExecutor
+import pygame
+from bundle import open_bundle
+from glyph_atlas import GlyphAtlas
+import utils
+
+
+class AssetHandle:
+    def __init__(self, future):
+        self._future = future
+
+    def is_ready(self):
+        return self._future.done()
+
+    def get(self):
+        return self._future.result()
+
+
+class AssetManager:
+    def __init__(self, max_workers=4):
+        # Each asset is stored as a future, so concurrent loads of the same
+        # path wait on the first one instead of loading it again
+        self._assets = {}
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.max_workers = max_workers
+        self._executor = None
+        self._bundle = None
+        self._is_bundle_opened = False
+
+    @property
+    def bundle(self):
+        # Frozen builds ship every asset in one mapped bundle
+        with self._lock:
+            if not self._is_bundle_opened:
+                self._bundle = open_bundle(utils.get_resource_path())
+                self._is_bundle_opened = True
+            return self._bundle
+
+    def _get(self, key, loader):
+        with self._lock:
+            future = self._assets.get(key)
+            is_loader = future is None
+            if is_loader:
+                self.misses += 1
+                future = Future()
+                self._assets[key] = future
+            else:
+                self.hits += 1
+        if is_loader:
+            try:
+                future.set_result(loader())
+            except BaseException as e:
+                future.set_exception(e)
+        return future.result()
+
+    def load_async(self, loader, *args, **kwargs):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers)
+            return AssetHandle(self._executor.submit(loader, *args, **kwargs))
+
+    def get_path(self, path):
+        return os.path.join(utils.get_resource_path(), path)
+
+    def read(self, path):
+        if self.bundle is not None and path in self.bundle:
+            return self.bundle.read(path)
+        with open(self.get_path(path), "rb") as f:
+            return f.read()
+
+    def _open(self, path):
+        if self.bundle is not None and path in self.bundle:
+            return io.BytesIO(self.bundle.read(path))
+        return self.get_path(path)
+
+    def text(self, path):
+        return self._get(
+            ("text", path),
+            lambda: str(self.read(path), "utf-8").replace("\r\n", "\n"),
+        )
+
+    def image(self, path):
+        def load():
+            img = pygame.image.load(self._open(path), path)
+            # Converting needs a display, so images loaded before set_mode
+            # stay in their file format
+            if pygame.display.get_surface() is not None:
+                if img.get_flags() & pygame.SRCALPHA:
+                    img = img.convert_alpha()
+                else:
+                    img = img.convert()
+            return img
+        return self._get(("image", path), load)
+
+    def font(self, path, size):
+        return self._get(
+            ("font", path, size),
+            lambda: pygame.font.Font(self._open(path), size),
+        )
+
+    def glyph_atlas(self, path, size, color):
+        return self._get(
+            ("glyph_atlas", path, size, tuple(color)),
+            lambda: GlyphAtlas(self.font(path, size), color),
+        )
+
+    def spritesheet(self, path):
+        from spritesheet import Spritesheet
+        return self._get(("spritesheet", path), lambda: Spritesheet(path))
+
+
+assets = AssetManager()
@@ -0,0 +1,53 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+import tempfile
+
+SKIP_INTRO = ", ".join(["wait 10, tap Z"] * 7)
+
+# Scripted routes through level01, each played in a fresh headless process
+ROUTES = {
+    "idle": f"{SKIP_INTRO}, wait 600",
+    "walk_to_pit": f"{SKIP_INTRO}, down RIGHT, wait 120, tap Z, wait 10, tap Z, wait 600",
+    "jump_along": f"{SKIP_INTRO}, down RIGHT, " + ", ".join(["hold UP 12, wait 40"] * 15),
+}
+
+
+def run_route(script):
+    fd, stats_path = tempfile.mkstemp(suffix=".json")
+    os.close(fd)
+    try:
+        # Assets are resolved from the working directory
+        subprocess.run([
+            sys.executable, "main.py",
+            "--headless",
+            "--script", script,
+            "--stats", stats_path,
+        ], cwd=os.path.dirname(os.path.abspath(__file__)), check=True,
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        with open(stats_path) as f:
+            return json.load(f)
+    finally:
+        os.remove(stats_path)
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "routes", nargs="*", default=list(ROUTES),
+        help="routes to run, defaults to all")
+    parser.add_argument("--out", help="write JSON here instead of stdout")
+    args = parser.parse_args()
+
+    results = {route: run_route(ROUTES[route]) for route in args.routes}
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+if __name__ == "__main__":
+    main()
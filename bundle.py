@@ -0,0 +1,98 @@
+import os
+import sys
+import mmap
+import struct
+
+MAGIC = b"GTWB"
+VERSION = 1
+# magic, version, entry count
+HEADER_FORMAT = "<4sHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# path length, then the path itself, data offset and data size
+ENTRY_FORMAT = "<H"
+ENTRY_SIZE = struct.calcsize(ENTRY_FORMAT)
+SPAN_FORMAT = "<QQ"
+SPAN_SIZE = struct.calcsize(SPAN_FORMAT)
+
+BUNDLE_NAME = "assets.pak"
+
+
+def normalize_path(path):
+    return path.replace("\\", "/")
+
+
+class Bundle:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            self._mm = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        self._view = memoryview(self._mm)
+        magic, version, entry_count = struct.unpack_from(
+            HEADER_FORMAT, self._view)
+        if magic != MAGIC or version != VERSION:
+            raise ValueError(f"unsupported asset bundle: {path}")
+
+        self.index = {}
+        pos = HEADER_SIZE
+        for _ in range(entry_count):
+            (path_len,) = struct.unpack_from(ENTRY_FORMAT, self._view, pos)
+            pos += ENTRY_SIZE
+            entry_path = bytes(self._view[pos:pos + path_len]).decode("utf-8")
+            pos += path_len
+            self.index[entry_path] = struct.unpack_from(
+                SPAN_FORMAT, self._view, pos)
+            pos += SPAN_SIZE
+
+    def __contains__(self, path):
+        return normalize_path(path) in self.index
+
+    def read(self, path):
+        # Zero-copy view into the mapped bundle
+        offset, size = self.index[normalize_path(path)]
+        return self._view[offset:offset + size]
+
+
+def open_bundle(resource_path):
+    path = os.path.join(resource_path, BUNDLE_NAME)
+    if not os.path.exists(path):
+        return None
+    return Bundle(path)
+
+
+def build_bundle(src_dir, out_path):
+    entries = []
+    for root, dirs, files in os.walk(src_dir):
+        dirs.sort()
+        for name in sorted(files):
+            file_path = os.path.join(root, name)
+            with open(file_path, "rb") as f:
+                entries.append((normalize_path(file_path), f.read()))
+
+    index_size = HEADER_SIZE + sum(
+        ENTRY_SIZE + len(path.encode("utf-8")) + SPAN_SIZE for path, _ in entries)
+    chunks = [struct.pack(HEADER_FORMAT, MAGIC, VERSION, len(entries))]
+    offset = index_size
+    for path, data in entries:
+        encoded_path = path.encode("utf-8")
+        chunks.append(struct.pack(ENTRY_FORMAT, len(encoded_path)))
+        chunks.append(encoded_path)
+        chunks.append(struct.pack(SPAN_FORMAT, offset, len(data)))
+        offset += len(data)
+    chunks.extend(data for _, data in entries)
+
+    out_dir = os.path.dirname(out_path)
+    if out_dir:
+        os.makedirs(out_dir, exist_ok=True)
+    with open(out_path, "wb") as f:
+        f.write(b"".join(chunks))
+    return len(entries), offset
+
+
+def main():
+    out_path = sys.argv[1] if len(sys.argv) > 1 else os.path.join(
+        "build", BUNDLE_NAME)
+    entry_count, size = build_bundle("assets", out_path)
+    print(f"assets -> {out_path} ({entry_count} files, {size} bytes)")
+
+
+if __name__ == "__main__":
+    main()
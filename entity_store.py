@@ -0,0 +1,202 @@
+import numpy as np
+import pygame
+import utils
+
+
+def round_half_away(values):
+    # Matches how a Rect rounds float coordinates
+    return np.sign(values) * np.floor(np.abs(values) + 0.5)
+
+
+class EntityStore:
+    def __init__(self, gravity_acc, drag, capacity=16):
+        self.gravity_acc = gravity_acc
+        self.drag = drag
+        # One row per entity, with each field in its own contiguous column so
+        # physics runs over every row at once
+        self.xs = np.zeros(capacity)
+        self.ys = np.zeros(capacity)
+        self.ws = np.zeros(capacity, dtype=np.int64)
+        self.hs = np.zeros(capacity, dtype=np.int64)
+        self.vxs = np.zeros(capacity)
+        self.vys = np.zeros(capacity)
+        self.is_alive = np.zeros(capacity, dtype=bool)
+        self.is_collide_bottom = np.zeros(capacity, dtype=bool)
+        # Rects mirror the columns after each update, so reading them is free
+        self.rects = [None] * capacity
+        self.row_count = 0
+        self._free_rows = []
+
+    def _grow(self):
+        capacity = len(self.xs) * 2
+        for name in ("xs", "ys", "ws", "hs", "vxs", "vys", "is_alive", "is_collide_bottom"):
+            column = getattr(self, name)
+            grown = np.zeros(capacity, dtype=column.dtype)
+            grown[:len(column)] = column
+            setattr(self, name, grown)
+        self.rects += [None] * (capacity - len(self.rects))
+
+    def add(self, position, size, velocity=(0, 0)):
+        if self._free_rows:
+            row = self._free_rows.pop()
+        else:
+            if self.row_count == len(self.xs):
+                self._grow()
+            row = self.row_count
+            self.row_count += 1
+        self.ws[row], self.hs[row] = size
+        self.vxs[row], self.vys[row] = velocity
+        self.is_alive[row] = True
+        self.is_collide_bottom[row] = False
+        self.rects[row] = pygame.Rect((0, 0), size)
+        self.set_position(row, position)
+        return row
+
+    def remove(self, row):
+        self.is_alive[row] = False
+        self.rects[row] = None
+        self._free_rows.append(row)
+
+    def set_position(self, row, position):
+        self.xs[row], self.ys[row] = position
+        self.rects[row].topleft = position
+
+    def update(self, lvl, substeps=1):
+        rows = np.flatnonzero(self.is_alive[:self.row_count])
+        self.is_collide_bottom[rows] = False
+        for _ in range(substeps):
+            self._integrate(rows, 1 / substeps)
+            self._move(lvl, rows, 1 / substeps)
+        pixel_xs = round_half_away(self.xs[rows])
+        pixel_ys = round_half_away(self.ys[rows])
+        for row, pixel_x, pixel_y in zip(rows, pixel_xs, pixel_ys):
+            self.rects[row].topleft = (int(pixel_x), int(pixel_y))
+
+    def _integrate(self, rows, dt):
+        gravity_x, gravity_y = self.gravity_acc
+        vxs = self.vxs[rows] + dt*gravity_x
+        # Drag pushes against horizontal motion until it stops, and never
+        # past that, or rounding leftovers would creep the entity backwards
+        self.vxs[rows] = np.sign(vxs)*np.maximum(np.abs(vxs) - dt*self.drag, 0)
+        self.vys[rows] += dt*gravity_y
+
+    def _move(self, lvl, rows, dt):
+        # Positions keep their sub-pixel part between steps, and are only
+        # rounded to build the rects collisions are tested with, so small
+        # substeps still add up
+        xs = self.xs[rows]
+        ys = self.ys[rows]
+        ws = self.ws[rows]
+        hs = self.hs[rows]
+        target_xs = xs + dt*self.vxs[rows]
+        target_ys = ys + dt*self.vys[rows]
+        pixel_xs = round_half_away(xs)
+        pixel_ys = round_half_away(ys)
+        pixel_target_xs = round_half_away(target_xs)
+        pixel_target_ys = round_half_away(target_ys)
+
+        # Broad phase: rows whose whole swept box is clear of solid cells
+        # just move, and only the rest are resolved one at a time
+        solid_counts = lvl.count_solid_cells(
+            np.minimum(pixel_xs, pixel_target_xs).astype(np.int64),
+            np.minimum(pixel_ys, pixel_target_ys).astype(np.int64),
+            np.maximum(pixel_xs, pixel_target_xs).astype(np.int64) + ws,
+            np.maximum(pixel_ys, pixel_target_ys).astype(np.int64) + hs,
+        )
+        is_clear = solid_counts == 0
+        self.xs[rows[is_clear]] = target_xs[is_clear]
+        self.ys[rows[is_clear]] = target_ys[is_clear]
+        for row in rows[~is_clear]:
+            if self._resolve(lvl, row, dt):
+                self.is_collide_bottom[row] = True
+
+    def _resolve(self, lvl, row, dt):
+        x = float(self.xs[row])
+        y = float(self.ys[row])
+        rect = pygame.Rect(
+            int(round_half_away(x)), int(round_half_away(y)),
+            int(self.ws[row]), int(self.hs[row]))
+
+        # Resolve any overlap we start in, then sweep each axis so fast
+        # movement stops at the first face it reaches instead of tunneling.
+        # Pushing out shifts the position by whole pixels, keeping its
+        # sub-pixel part
+        start_x, start_y = rect.topleft
+        is_collide_bottom = self._push_out(lvl, row, rect)
+        x += rect.x - start_x
+        y += rect.y - start_y
+
+        target_x = x + dt*self.vxs[row]
+        dx, is_hit_x = self._sweep(
+            lvl, rect, int(round_half_away(target_x)) - rect.x, 0)
+        rect.x += dx
+        if is_hit_x:
+            # Stopped flush against the face it hit
+            x = rect.x
+            self.vxs[row] = 0
+        else:
+            x = target_x
+
+        target_y = y + dt*self.vys[row]
+        dy, is_hit_y = self._sweep(
+            lvl, rect, 0, int(round_half_away(target_y)) - rect.y)
+        rect.y += dy
+        if is_hit_y:
+            if self.vys[row] > 0:
+                is_collide_bottom = True
+            y = rect.y
+            self.vys[row] = 0
+        else:
+            y = target_y
+        self.xs[row] = x
+        self.ys[row] = y
+        return is_collide_bottom
+
+    def _sweep(self, lvl, rect, dx, dy):
+        # Time of impact along a single axis, in whole pixels of travel
+        if dx == 0 and dy == 0:
+            return 0, False
+        swept_rect = rect.union(rect.move(dx, dy))
+        dist = dx if dx != 0 else dy
+        is_hit = False
+        for hit_rect in lvl.get_colliders(swept_rect):
+            if dx > 0 and hit_rect.left >= rect.right:
+                entry_dist = hit_rect.left - rect.right
+            elif dx < 0 and hit_rect.right <= rect.left:
+                entry_dist = hit_rect.right - rect.left
+            elif dy > 0 and hit_rect.top >= rect.bottom:
+                entry_dist = hit_rect.top - rect.bottom
+            elif dy < 0 and hit_rect.bottom <= rect.top:
+                entry_dist = hit_rect.bottom - rect.top
+            else:
+                continue
+            if abs(entry_dist) <= abs(dist):
+                dist = entry_dist
+                is_hit = True
+        return dist, is_hit
+
+    def _push_out(self, lvl, row, rect):
+        is_collide_bottom = False
+        for hit_rect in lvl.get_colliders(rect):
+            # Make sure the entity is always outside of block
+            left_dist = abs(rect.right - hit_rect.left)
+            right_dist = abs(rect.left - hit_rect.right)
+            top_dist = abs(rect.bottom - hit_rect.top)
+            bottom_dist = abs(rect.top - hit_rect.bottom)
+            min_idx = utils.argmin(
+                [top_dist, bottom_dist, left_dist, right_dist]
+            )
+            if min_idx == 0:
+                rect.bottom = hit_rect.top
+                self.vys[row] = 0
+                is_collide_bottom = True
+            elif min_idx == 1:
+                rect.top = hit_rect.bottom
+                self.vys[row] = 0
+            elif min_idx == 2:
+                rect.right = hit_rect.left
+                self.vxs[row] = 0
+            elif min_idx == 3:
+                rect.left = hit_rect.right
+                self.vxs[row] = 0
+        return is_collide_bottom
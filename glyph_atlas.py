@@ -0,0 +1,62 @@
+import pygame
+
+ATLAS_CHARS = "".join(chr(c) for c in range(32, 127))
+
+
+class GlyphAtlas:
+    def __init__(self, font, color):
+        self.font = font
+        self.color = color
+        self.height = font.get_height()
+
+        # Printable ASCII is rasterized once into a single strip, anything
+        # else gets its own surface the first time it's drawn
+        glyph_imgs = [(c, font.render(c, False, color)) for c in ATLAS_CHARS]
+        self.atlas_img = pygame.Surface(
+            (sum(img.get_width() for _, img in glyph_imgs), self.height),
+            pygame.SRCALPHA,
+        )
+        self.glyphs = {}
+        x = 0
+        for c, img in glyph_imgs:
+            self.atlas_img.blit(img, (x, 0))
+            self.glyphs[c] = (
+                self.atlas_img,
+                pygame.Rect((x, 0), img.get_size()),
+                self._get_advance(c, img),
+            )
+            x += img.get_width()
+
+    def _get_advance(self, c, img):
+        metrics = self.font.metrics(c)
+        if metrics and metrics[0]:
+            return metrics[0][4]
+        return img.get_width()
+
+    def _get_glyph(self, c):
+        glyph = self.glyphs.get(c)
+        if glyph is None:
+            img = self.font.render(c, False, self.color)
+            glyph = (img, img.get_rect(), self._get_advance(c, img))
+            self.glyphs[c] = glyph
+        return glyph
+
+    def size(self, text):
+        return (sum(self._get_glyph(c)[2] for c in text), self.height)
+
+    def get_blits(self, text, position):
+        x, y = position
+        blits = []
+        for c in text:
+            img, area, advance = self._get_glyph(c)
+            blits.append((img, (x, y), area))
+            x += advance
+        return blits
+
+    def blit_text(self, surface, text, position):
+        surface.blits(self.get_blits(text, position), False)
+
+    def render(self, text):
+        img = pygame.Surface(self.size(text), pygame.SRCALPHA)
+        self.blit_text(img, text, (0, 0))
+        return img
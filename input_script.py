@@ -0,0 +1,48 @@
+import re
+import pygame
+
+KEYS = {
+    "LEFT": pygame.K_LEFT,
+    "RIGHT": pygame.K_RIGHT,
+    "UP": pygame.K_UP,
+    "Z": pygame.K_z,
+}
+
+
+def parse_script(text):
+    # Commands are separated by commas or newlines, e.g.
+    # "hold RIGHT 120, tap UP, wait 30", with durations in ticks. Returns
+    # ({tick: [(type, key)]}, length)
+    events = {}
+    tick = 0
+    for command in re.split(r"[,\n]", text):
+        args = command.split()
+        if not args:
+            continue
+        name = args[0].lower()
+        if name == "wait":
+            tick += int(args[1])
+        elif name in ("down", "up", "tap", "hold"):
+            key = KEYS[args[1].upper()]
+            if name == "up":
+                events.setdefault(tick, []).append((pygame.KEYUP, key))
+                continue
+            events.setdefault(tick, []).append((pygame.KEYDOWN, key))
+            if name == "down":
+                continue
+            tick += int(args[2]) if name == "hold" else 1
+            events.setdefault(tick, []).append((pygame.KEYUP, key))
+        else:
+            raise Exception(f"unknown script command: {command.strip()}")
+    return events, tick
+
+
+class ScriptedInput:
+    def __init__(self, text):
+        self.events, self.length = parse_script(text)
+
+    def is_done(self, tick):
+        return tick >= self.length
+
+    def get_events(self, tick):
+        return self.events.get(tick, ())
@@ -1 +1,3 @@
-pyinstaller --onefile main.py  --add-data="assets/animations;assets/animations" --add-data="assets/fonts;assets/fonts" --add-data="assets/images;assets/images" --add-data="assets/levels;assets/levels" --add-data="assets/spritesheets;assets/spritesheets" --windowed --icon="assets/images/icon.ico"
\ No newline at end of file
+python level_compiler.py
+python bundle.py build/assets.pak
+pyinstaller --onefile main.py  --add-data="build/assets.pak;." --windowed --icon="assets/images/icon.ico"
\ No newline at end of file
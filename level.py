@@ -1,69 +1,287 @@
-import os
+from array import array
+import threading
+import queue
+import numpy as np
 import pygame
-from spritesheet import Spritesheet
-import utils
+from asset_manager import assets
+from animation import Animation
+from level_compiler import load_level, EMPTY_TILE
 
 
-class Block(pygame.sprite.Sprite):
-    def __init__(self, position, image):
-        super().__init__()
-        self.image = image
-        self.rect = self.image.get_rect()
-        self.rect.topleft = position
+CHUNK_W = 256
+CHUNK_H = 256
 
+# Chunks kept resident around the view when streaming, plus extra chunks
+# baked ahead in the direction the view is moving
+STREAM_RADIUS = 1
+STREAM_AHEAD = 2
 
-CHAR_LOOKUP = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
 
+class Level:
+    def __init__(self, path, is_streaming=False):
+        level_data = load_level(path)
+        self.ss = assets.spritesheet(level_data["ss_path"])
 
-def char2idx(c):
-    return CHAR_LOOKUP.find(c)
+        self.offset_x = level_data["offset_x"]
+        self.offset_y = level_data["offset_y"]
+        self.tile_w = self.ss.tile_w
+        self.tile_h = self.ss.tile_h
+        self.cols = level_data["cols"]
+        self.rows = level_data["rows"]
+        self.layers = level_data["layers"]
+        self.solid_mask = level_data["solid_mask"]
+        # Animated tiles aren't baked, every cell of one tile follows the same
+        # shared animation
+        self.animations = {
+            tile_idx: Animation(anim_path)
+            for tile_idx, anim_path in level_data["animated_tiles"].items()
+        }
 
+        # Blocks per chunk across all layers, so drawing can report how many
+        # blocks it skipped without walking the off-screen cells
+        self.chunk_block_counts = {}
+        self.animated_block_count = 0
+        for tiles in self.layers:
+            for idx, tile_idx in enumerate(tiles):
+                if tile_idx == EMPTY_TILE:
+                    continue
+                if tile_idx in self.animations:
+                    self.animated_block_count += 1
+                    continue
+                row, col = divmod(idx, self.cols)
+                key = (
+                    (self.offset_x + col * self.tile_w) // CHUNK_W,
+                    (self.offset_y + row * self.tile_h) // CHUNK_H,
+                )
+                self.chunk_block_counts[key] = self.chunk_block_counts.get(key, 0) + 1
+        self.block_count = sum(self.chunk_block_counts.values()) + self.animated_block_count
 
-class Level:
-    def __init__(self, path):
-        with open(os.path.join(utils.get_resource_path(), path), "r") as f:
-            text = f.read()
-        header_data, data = utils.parse_dat(text)
-        ss_path = header_data["ss_path"]
-        self.ss = Spritesheet(ss_path)
-
-        offset_x = int(header_data["offset_x"])
-        offset_y = int(header_data["offset_y"])
-        collidable_blocks_set = set(
-            [c for c in header_data["collidable_blocks"]])
-
-        self.layers = []
-        self.collidable_block_group = pygame.sprite.Group()
-        line_idx = 0
-        while line_idx < len(data):
-            collidable_blocks = []
-            noncollidable_blocks = []
-            curr_x = offset_x
-            curr_y = offset_y
-            while line_idx < len(data):
-                line = data[line_idx]
-                if line == "---":
-                    break
-                for c in line:
-                    if c == ".":
-                        pass
-                    else:
-                        tile_idx = char2idx(c)
-                        b = Block(
-                            position=(curr_x, curr_y),
-                            image=self.ss.image_at(tile_idx),
-                        )
-                        if c in collidable_blocks_set:
-                            collidable_blocks.append(b)
-                            self.collidable_block_group.add(b)
-                        else:
-                            noncollidable_blocks.append(b)
-                    curr_x += self.ss.tile_w
-                curr_x = offset_x
-                curr_y += self.ss.tile_h
-                line_idx += 1
-            self.layers.append({
-                "collidable_blocks": collidable_blocks,
-                "noncollidable_blocks": noncollidable_blocks,
-            })
-            line_idx += 1
+        level_rect = pygame.Rect(
+            self.offset_x, self.offset_y, self.cols * self.tile_w, self.rows * self.tile_h)
+        self.chunk_bounds = (
+            range(level_rect.left // CHUNK_W, (level_rect.right - 1) // CHUNK_W + 1),
+            range(level_rect.top // CHUNK_H, (level_rect.bottom - 1) // CHUNK_H + 1),
+        )
+        self.chunk_layers = [{} for _ in self.layers]
+        self.resident_chunks = set()
+        self.is_streaming = is_streaming
+        # Guards chunk_layers, resident_chunks and _pending_chunks, which the
+        # streaming worker publishes into
+        self._chunk_lock = threading.Lock()
+        if self.is_streaming:
+            self._pending_chunks = set()
+            self._chunk_requests = queue.Queue()
+            self._last_view_center = None
+            threading.Thread(target=self._chunk_worker, daemon=True).start()
+        else:
+            for cy in self.chunk_bounds[1]:
+                for cx in self.chunk_bounds[0]:
+                    self._load_chunk((cx, cy))
+
+        # Merged collider rects indexed by every cell they cover, stored 1-based
+        # so 0 means no collider
+        self.collider_grid = array("I", [0]) * (self.cols * self.rows)
+        self.colliders = self._merge_colliders()
+        # Summed-area table of the solid mask, so the solid cells under any
+        # number of rects can be counted at once
+        solid_grid = np.frombuffer(
+            bytes(self.solid_mask), dtype=np.uint8).reshape(self.rows, self.cols)
+        self.solid_sat = np.zeros((self.rows + 1, self.cols + 1), dtype=np.int32)
+        self.solid_sat[1:, 1:] = solid_grid.cumsum(axis=0).cumsum(axis=1)
+
+    def _merge_colliders(self):
+        colliders = []
+        remaining = bytearray(self.solid_mask)
+        for row in range(self.rows):
+            for col in range(self.cols):
+                if not remaining[row * self.cols + col]:
+                    continue
+                # Grow the run as wide as possible, then as tall as the run allows
+                w = 1
+                while col + w < self.cols and remaining[row * self.cols + col + w]:
+                    w += 1
+                h = 1
+                while row + h < self.rows and all(remaining[(row + h) * self.cols + col:(row + h) * self.cols + col + w]):
+                    h += 1
+                rect = pygame.Rect(
+                    self.offset_x + col * self.tile_w,
+                    self.offset_y + row * self.tile_h,
+                    w * self.tile_w,
+                    h * self.tile_h,
+                )
+                colliders.append(rect)
+                for r in range(row, row + h):
+                    start = r * self.cols + col
+                    remaining[start:start + w] = bytes(w)
+                    self.collider_grid[start:start + w] = array(
+                        "I", [len(colliders)]) * w
+        return colliders
+
+    def get_cell_range(self, rect):
+        first_col = max((rect.left - self.offset_x) // self.tile_w, 0)
+        last_col = min((rect.right - 1 - self.offset_x) //
+                       self.tile_w, self.cols - 1)
+        first_row = max((rect.top - self.offset_y) // self.tile_h, 0)
+        last_row = min((rect.bottom - 1 - self.offset_y) //
+                       self.tile_h, self.rows - 1)
+        return range(first_col, last_col + 1), range(first_row, last_row + 1)
+
+    def count_solid_cells(self, lefts, tops, rights, bottoms):
+        # Vectorized over arrays of pixel bounds, with right and bottom
+        # exclusive like a Rect
+        first_cols = np.clip((lefts - self.offset_x) // self.tile_w, 0, self.cols)
+        last_cols = np.clip((rights - 1 - self.offset_x) // self.tile_w + 1, 0, self.cols)
+        first_rows = np.clip((tops - self.offset_y) // self.tile_h, 0, self.rows)
+        last_rows = np.clip((bottoms - 1 - self.offset_y) // self.tile_h + 1, 0, self.rows)
+        sat = self.solid_sat
+        return (sat[last_rows, last_cols] - sat[first_rows, last_cols]
+                - sat[last_rows, first_cols] + sat[first_rows, first_cols])
+
+    def get_tiles(self, tiles, rect):
+        cols, rows = self.get_cell_range(rect)
+        found_tiles = []
+        for row in rows:
+            for col in cols:
+                tile_idx = tiles[row * self.cols + col]
+                if tile_idx != EMPTY_TILE and tile_idx not in self.animations:
+                    position = (self.offset_x + col * self.tile_w,
+                                self.offset_y + row * self.tile_h)
+                    found_tiles.append((position, tile_idx))
+        return found_tiles
+
+    def get_colliders(self, rect):
+        cols, rows = self.get_cell_range(rect)
+        colliders = []
+        for row in rows:
+            for col in cols:
+                collider_idx = self.collider_grid[row * self.cols + col]
+                if collider_idx:
+                    collider = self.colliders[collider_idx - 1]
+                    if collider not in colliders:
+                        colliders.append(collider)
+        return colliders
+
+    def _bake_chunk(self, tiles, key):
+        cx, cy = key
+        chunk_rect = pygame.Rect(cx * CHUNK_W, cy * CHUNK_H, CHUNK_W, CHUNK_H)
+        chunk_tiles = self.get_tiles(tiles, chunk_rect)
+        if not chunk_tiles:
+            return None
+        chunk_img = pygame.Surface(chunk_rect.size, pygame.SRCALPHA)
+        for position, tile_idx in chunk_tiles:
+            chunk_img.blit(
+                self.ss.image_at(tile_idx),
+                (position[0] - chunk_rect.left, position[1] - chunk_rect.top),
+            )
+        return chunk_img
+
+    def _load_chunk(self, key):
+        self._publish_chunk(key, self._bake_chunks(key))
+
+    def _bake_chunks(self, key):
+        return [self._bake_chunk(tiles, key) for tiles in self.layers]
+
+    def _publish_chunk(self, key, chunk_imgs):
+        for chunks, chunk_img in zip(self.chunk_layers, chunk_imgs):
+            if chunk_img is not None:
+                chunks[key] = chunk_img
+        self.resident_chunks.add(key)
+
+    def _unload_chunk(self, key):
+        for chunks in self.chunk_layers:
+            chunks.pop(key, None)
+        self.resident_chunks.discard(key)
+
+    def _chunk_worker(self):
+        while True:
+            key = self._chunk_requests.get()
+            with self._chunk_lock:
+                if key not in self._pending_chunks:
+                    # Evicted or already baked since it was requested
+                    continue
+            # Baked outside the lock so the main thread never waits on it
+            chunk_imgs = self._bake_chunks(key)
+            with self._chunk_lock:
+                if key not in self._pending_chunks:
+                    # Evicted or baked on the main thread while this was baking
+                    continue
+                self._pending_chunks.discard(key)
+                self._publish_chunk(key, chunk_imgs)
+
+    def stream_chunks(self, rect):
+        if not self.is_streaming:
+            return
+        if self._last_view_center is None:
+            self._last_view_center = rect.center
+        dir_x = (rect.centerx > self._last_view_center[0]) - \
+            (rect.centerx < self._last_view_center[0])
+        dir_y = (rect.centery > self._last_view_center[1]) - \
+            (rect.centery < self._last_view_center[1])
+        self._last_view_center = rect.center
+
+        view_cols = range(rect.left // CHUNK_W, (rect.right - 1) // CHUNK_W + 1)
+        view_rows = range(rect.top // CHUNK_H, (rect.bottom - 1) // CHUNK_H + 1)
+        first_cx = view_cols[0] - STREAM_RADIUS - (STREAM_AHEAD if dir_x < 0 else 0)
+        last_cx = view_cols[-1] + STREAM_RADIUS + (STREAM_AHEAD if dir_x > 0 else 0)
+        first_cy = view_rows[0] - STREAM_RADIUS - (STREAM_AHEAD if dir_y < 0 else 0)
+        last_cy = view_rows[-1] + STREAM_RADIUS + (STREAM_AHEAD if dir_y > 0 else 0)
+
+        wanted_chunks = set()
+        for cy in range(max(first_cy, self.chunk_bounds[1].start), min(last_cy + 1, self.chunk_bounds[1].stop)):
+            for cx in range(max(first_cx, self.chunk_bounds[0].start), min(last_cx + 1, self.chunk_bounds[0].stop)):
+                wanted_chunks.add((cx, cy))
+
+        with self._chunk_lock:
+            for key in self.resident_chunks - wanted_chunks:
+                self._unload_chunk(key)
+            self._pending_chunks &= wanted_chunks
+            # Chunks on screen can't wait for the worker
+            missing_visible_chunks = [
+                key for key in wanted_chunks
+                if key[0] in view_cols and key[1] in view_rows
+                and key not in self.resident_chunks
+            ]
+            for key in missing_visible_chunks:
+                self._pending_chunks.discard(key)
+                self._load_chunk(key)
+            # Nearest chunks first, so those ahead of the view are baked early
+            center = (rect.centerx // CHUNK_W, rect.centery // CHUNK_H)
+            requested_chunks = sorted(
+                wanted_chunks - self.resident_chunks - self._pending_chunks,
+                key=lambda key: abs(key[0] - center[0]) + abs(key[1] - center[1]),
+            )
+            for key in requested_chunks:
+                self._pending_chunks.add(key)
+                self._chunk_requests.put(key)
+
+    def get_visible_images(self, rect):
+        # Returns the images to draw and how many blocks were culled
+        visible_images = []
+        drawn_count = 0
+        cols, rows = self.get_cell_range(rect)
+        view_chunks = [
+            (cx, cy)
+            for cy in range(rect.top // CHUNK_H, (rect.bottom - 1) // CHUNK_H + 1)
+            for cx in range(rect.left // CHUNK_W, (rect.right - 1) // CHUNK_W + 1)
+        ]
+        for key in view_chunks:
+            drawn_count += self.chunk_block_counts.get(key, 0)
+        for tiles, chunks in zip(self.layers, self.chunk_layers):
+            with self._chunk_lock:
+                for key in view_chunks:
+                    chunk_img = chunks.get(key)
+                    if chunk_img is not None:
+                        visible_images.append(
+                            ((key[0] * CHUNK_W, key[1] * CHUNK_H), chunk_img))
+            if self.animations:
+                for row in rows:
+                    for col in cols:
+                        anim = self.animations.get(tiles[row * self.cols + col])
+                        if anim is not None:
+                            visible_images.append((
+                                (self.offset_x + col * self.tile_w,
+                                 self.offset_y + row * self.tile_h),
+                                self.ss.image_at(anim.get_current_tile_idx()),
+                            ))
+                            drawn_count += 1
+        return visible_images, self.block_count - drawn_count
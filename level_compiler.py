@@ -0,0 +1,247 @@
+import os
+import sys
+import glob
+import mmap
+import struct
+from array import array
+from asset_manager import assets
+import utils
+
+MAGIC = b"GTWL"
+VERSION = 2
+# magic, version, source mtime_ns, source size, offset_x, offset_y, cols,
+# rows, layer count, ss_path length, animated tile count
+HEADER_FORMAT = "<4sHqqiiIIHHH"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+# tile index, animation path length
+ANIMATED_TILE_FORMAT = "<BH"
+ANIMATED_TILE_SIZE = struct.calcsize(ANIMATED_TILE_FORMAT)
+LENGTH_FORMAT = "<I"
+LENGTH_SIZE = struct.calcsize(LENGTH_FORMAT)
+
+# Tile index stored for cells with no block
+EMPTY_TILE = 255
+
+CHAR_LOOKUP = "0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZabcdefghijklmnopqrstuvwxyz"
+
+
+def char2idx(c):
+    return CHAR_LOOKUP.find(c)
+
+
+def parse_level(text):
+    header_data, data = utils.parse_dat(text)
+    collidable_blocks_set = set(
+        [c for c in header_data["collidable_blocks"]])
+    # Optional "animated_tiles: a=assets/animations/foo.dat, b=..." maps a
+    # tile to the animation that drives every cell using it
+    animated_tiles = {}
+    if "animated_tiles" in header_data:
+        for entry in header_data["animated_tiles"].split(","):
+            c, anim_path = entry.split("=", 1)
+            animated_tiles[char2idx(c.strip())] = anim_path.strip()
+
+    layer_lines = [[]]
+    for line in data:
+        if line == "---":
+            layer_lines.append([])
+        else:
+            layer_lines[-1].append(line)
+    cols = max(len(line) for lines in layer_lines for line in lines)
+    rows = max(len(lines) for lines in layer_lines)
+
+    # Each layer is a flat row-major grid of tile indices, and solid cells
+    # of every layer are OR'd into one mask
+    layers = []
+    solid_mask = bytearray(cols * rows)
+    for lines in layer_lines:
+        tiles = array("B", [EMPTY_TILE]) * (cols * rows)
+        for row, line in enumerate(lines):
+            for col, c in enumerate(line):
+                if c != ".":
+                    tile_idx = char2idx(c)
+                    if tile_idx == -1:
+                        raise ValueError(
+                            f"unknown tile {c!r} at row {row}, column {col}")
+                    tiles[row * cols + col] = tile_idx
+                    if c in collidable_blocks_set:
+                        solid_mask[row * cols + col] = 1
+        layers.append(tiles)
+
+    return {
+        "ss_path": header_data["ss_path"],
+        "offset_x": int(header_data["offset_x"]),
+        "offset_y": int(header_data["offset_y"]),
+        "cols": cols,
+        "rows": rows,
+        "layers": layers,
+        "solid_mask": solid_mask,
+        "animated_tiles": animated_tiles,
+    }
+
+
+def encode_rle(data):
+    encoded = bytearray()
+    idx = 0
+    while idx < len(data):
+        value = data[idx]
+        run = 1
+        while run < 255 and idx + run < len(data) and data[idx + run] == value:
+            run += 1
+        encoded.append(run)
+        encoded.append(value)
+        idx += run
+    return bytes(encoded)
+
+
+def decode_rle(buf, size):
+    if len(buf) % 2:
+        raise ValueError("run-length data is truncated")
+    decoded = bytearray()
+    for idx in range(0, len(buf), 2):
+        decoded += bytes((buf[idx + 1],)) * buf[idx]
+    if len(decoded) != size:
+        raise ValueError("run-length data does not match expected size")
+    return decoded
+
+
+def compile_level(text, src_mtime_ns, src_size):
+    level_data = parse_level(text)
+    ss_path = level_data["ss_path"].encode("utf-8")
+    chunks = [struct.pack(
+        HEADER_FORMAT,
+        MAGIC,
+        VERSION,
+        src_mtime_ns,
+        src_size,
+        level_data["offset_x"],
+        level_data["offset_y"],
+        level_data["cols"],
+        level_data["rows"],
+        len(level_data["layers"]),
+        len(ss_path),
+        len(level_data["animated_tiles"]),
+    ), ss_path]
+    for tile_idx, anim_path in level_data["animated_tiles"].items():
+        anim_path = anim_path.encode("utf-8")
+        chunks.append(struct.pack(
+            ANIMATED_TILE_FORMAT, tile_idx, len(anim_path)))
+        chunks.append(anim_path)
+    for grid in level_data["layers"] + [level_data["solid_mask"]]:
+        encoded = encode_rle(bytes(grid))
+        chunks.append(struct.pack(LENGTH_FORMAT, len(encoded)))
+        chunks.append(encoded)
+    return b"".join(chunks)
+
+
+def read_header(buf):
+    magic, version, src_mtime_ns, src_size, offset_x, offset_y, cols, rows, layer_count, ss_path_len, animated_tile_count = struct.unpack_from(
+        HEADER_FORMAT, buf)
+    if magic != MAGIC:
+        raise ValueError("not a compiled level")
+    return {
+        "version": version,
+        "src_mtime_ns": src_mtime_ns,
+        "src_size": src_size,
+        "offset_x": offset_x,
+        "offset_y": offset_y,
+        "cols": cols,
+        "rows": rows,
+        "layer_count": layer_count,
+        "ss_path_len": ss_path_len,
+        "animated_tile_count": animated_tile_count,
+    }
+
+
+def read_compiled(buf):
+    header = read_header(buf)
+    if header["version"] != VERSION:
+        raise ValueError("compiled level is from another version")
+    size = header["cols"] * header["rows"]
+    with memoryview(buf) as view:
+        pos = HEADER_SIZE
+        ss_path = bytes(view[pos:pos + header["ss_path_len"]]).decode("utf-8")
+        pos += header["ss_path_len"]
+        animated_tiles = {}
+        for _ in range(header["animated_tile_count"]):
+            tile_idx, anim_path_len = struct.unpack_from(
+                ANIMATED_TILE_FORMAT, view, pos)
+            pos += ANIMATED_TILE_SIZE
+            animated_tiles[tile_idx] = bytes(
+                view[pos:pos + anim_path_len]).decode("utf-8")
+            pos += anim_path_len
+        grids = []
+        for _ in range(header["layer_count"] + 1):
+            (length,) = struct.unpack_from(LENGTH_FORMAT, view, pos)
+            pos += LENGTH_SIZE
+            # Copied out so no slice of a mapped file outlives this block,
+            # which would stop the mapping from closing if decoding fails
+            grids.append(decode_rle(bytes(view[pos:pos + length]), size))
+            pos += length
+
+    layers = []
+    for grid in grids[:-1]:
+        tiles = array("B")
+        tiles.frombytes(grid)
+        layers.append(tiles)
+    return {
+        "ss_path": ss_path,
+        "offset_x": header["offset_x"],
+        "offset_y": header["offset_y"],
+        "cols": header["cols"],
+        "rows": header["rows"],
+        "layers": layers,
+        "solid_mask": grids[-1],
+        "animated_tiles": animated_tiles,
+    }
+
+
+def get_compiled_path(path):
+    return os.path.splitext(path)[0] + ".lvl"
+
+
+def compile_file(src_path):
+    with open(src_path, "r") as f:
+        text = f.read()
+    src_stat = os.stat(src_path)
+    data = compile_level(text, src_stat.st_mtime_ns, src_stat.st_size)
+    try:
+        with open(get_compiled_path(src_path), "wb") as f:
+            f.write(data)
+    except OSError:
+        # Read-only installs still work, they just compile on every load
+        pass
+    return data
+
+
+def load_level(path):
+    if assets.bundle is not None and path in assets.bundle:
+        # Bundled levels can't change after the build, so skip staleness checks
+        compiled_path = get_compiled_path(path)
+        if compiled_path in assets.bundle:
+            return read_compiled(assets.bundle.read(compiled_path))
+        return parse_level(assets.text(path))
+
+    src_path = os.path.join(utils.get_resource_path(), path)
+    src_stat = os.stat(src_path)
+    try:
+        with open(get_compiled_path(src_path), "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                header = read_header(mm)
+                if header["version"] == VERSION and header["src_mtime_ns"] == src_stat.st_mtime_ns and header["src_size"] == src_stat.st_size:
+                    return read_compiled(mm)
+    except (OSError, ValueError, struct.error):
+        pass
+    # Missing, stale or unreadable, so rebuild from the text source
+    return read_compiled(compile_file(src_path))
+
+
+def main():
+    paths = sys.argv[1:] or sorted(glob.glob("assets/levels/*.dat"))
+    for path in paths:
+        data = compile_file(path)
+        print(f"{path} -> {get_compiled_path(path)} ({len(data)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,14 +1,24 @@
 import os
 import enum
 import collections
+import argparse
+import json
+import time
 import pygame
-from spritesheet import Spritesheet
+from asset_manager import assets
 from level import Level
-from animation import Animation
+from animation import Animation, animation_clock
 from textbox import Textbox
 from npc import NPC
+from renderer import Renderer
+from overlay import Fader, EndingScreen, OverlayCompositor, PerfOverlay
+from trigger_index import TriggerIndex
+from scheduler import UpdateScheduler
+from entity_store import EntityStore
+from input_script import ScriptedInput
+import perf
+import replay
 import vec2
-import utils
 
 VERSION = "1.0.0"
 
@@ -19,16 +29,22 @@ SCREEN_CENTER = (SCREEN_WIDTH // 2, SCREEN_HEIGHT // 2)
 
 BACKGROUND = (255, 255, 255)
 
+# Simulation runs at a fixed rate that physics constants are tuned for, while
+# rendering runs as fast as MAX_FPS allows
+TICK_RATE = 60
+TICK_MS = 1000 / TICK_RATE
+MAX_TICKS_PER_FRAME = 5
+MAX_FPS = 120
+# Redraw and present only the regions that changed since the last frame
+DIRTY_RECTS = False
+
 GRAVITY_ACC = (0, 0.2)
-DRAG = 0.2
-PLAYER_SPEED = 2
+DRAG = 0.25
+# Drag takes its share back every tick, leaving a 2 px per tick walk
+PLAYER_SPEED = 2 + DRAG
 JUMP_COOLDOWN = 100
-
-tiles_ss = Spritesheet("assets/spritesheets/tiles.dat")
-player_office_ss = Spritesheet("assets/spritesheets/player_office.dat")
-player_pjs_ss = Spritesheet("assets/spritesheets/player_pjs.dat")
-
-player_walk_anim = Animation("assets/animations/player_walk.dat")
+# Physics steps per update, each advancing 1/PHYSICS_SUBSTEPS of a tick
+PHYSICS_SUBSTEPS = 1
 
 
 class GameState(enum.Enum):
@@ -44,91 +60,34 @@ class GameManager:
         self.left_home_flag = False
 
 
-class Fader(pygame.sprite.Sprite):
-    def __init__(self,  color=(0, 0, 0), delta=5):
-        super().__init__()
-        self.rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-        self.image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
-        self.image.fill(color)
-        self.alpha = 255
-        self.image.set_alpha(self.alpha)
-        self.target_alpha = self.alpha
-        self.delta = delta
-
-    def fade_in(self):
-        self.target_alpha = 0
-
-    def fade_out(self):
-        self.target_alpha = 255
-
-    def update(self):
-        if self.alpha < self.target_alpha:
-            self.alpha += self.delta
-        elif self.alpha > self.target_alpha:
-            self.alpha -= self.delta
-        self.image.set_alpha(self.alpha)
-
-
-class EndingScreen(pygame.sprite.Sprite):
-    def __init__(self):
-        super().__init__()
-        self.font = pygame.font.Font(os.path.join(
-            utils.get_resource_path(), "assets/fonts/Grand9K Pixel.ttf"), 10)
-        self.rect = pygame.Rect(0, 0, SCREEN_WIDTH, SCREEN_HEIGHT)
-        self.image = pygame.Surface(self.rect.size, pygame.SRCALPHA)
-        self.ending_text = "THE END"
-        self.start_ms = -1
-        self.is_playing = False
-        self.callback = None
-
-    def play(self, ending_text, callback=None):
-        self.start_ms = pygame.time.get_ticks()
-        self.is_playing = True
-        self.ending_text = ending_text
-        self.callback = callback
-
-    def update(self):
-        if self.is_playing:
-            now = pygame.time.get_ticks()
-            self.image = pygame.Surface(self.rect.size)
-            self.image.fill((0, 0, 0))
-            lines = self.ending_text.split("\n")
-            for idx, text in enumerate(lines):
-                text_img = self.font.render(
-                    text,
-                    False,
-                    (255, 255, 255),
-                )
-                text_img_rect = text_img.get_rect()
-                self.image.blit(text_img, (SCREEN_WIDTH // 2 - text_img_rect.width //
-                                           2, SCREEN_HEIGHT // 2 - text_img_rect.height // 2 + 10*idx))
-            if now - self.start_ms > 100:
-                if self.callback:
-                    self.callback()
-
-
-def to_screen_coords(position, camera):
-    return vec2.add(
+def to_screen_coords(position, camera_position):
+    return vec2.rounded(vec2.add(
         vec2.add(
-            position, vec2.scale(camera.position, -1)
+            position, vec2.scale(camera_position, -1)
         ),
         SCREEN_CENTER,
-    )
+    ))
 
 
-def is_block_on_screen(block, camera):
-    coords = to_screen_coords(block.rect.topleft, camera)
-    img_rect = block.image.get_rect()
-    return coords[0] + img_rect.width >= 0 and coords[0] < SCREEN_WIDTH and coords[1] + img_rect.height >= 0 and coords[1] < SCREEN_HEIGHT
+def get_view_rect(camera_position):
+    return pygame.Rect(
+        vec2.rounded(vec2.add(camera_position, vec2.scale(SCREEN_CENTER, -1))),
+        SCREEN_SIZE,
+    )
 
 
 class Camera:
     def __init__(self, player, size):
         self.player = player
         self.position = player.rect.center
+        self.prev_position = self.position
         self.size = size
 
+    def get_render_position(self, alpha):
+        return vec2.lerp(self.prev_position, self.position, alpha)
+
     def update(self):
+        self.prev_position = self.position
         w, h = self.size
         x, y = self.position
         player_x, player_y = self.player.rect.center
@@ -153,72 +112,67 @@ class PlayerState(enum.Enum):
 
 
 class Player(pygame.sprite.Sprite):
-    def __init__(self, position):
+    def __init__(self, position, ss, walk_anim, entities):
         super().__init__()
-        self.ss = player_pjs_ss
+        self.ss = ss
         self.image = self.ss.image_at(0)
-        self.rect = pygame.Rect(
-            (0, 0), (self.ss.tile_w, self.ss.tile_h))
-        self.rect.topleft = position
-        self.velocity = (0, 0)
+        # Position and velocity live in the shared entity store, so physics
+        # for every actor runs in one batch
+        self.entities = entities
+        self.row = self.entities.add(position, (self.ss.tile_w, self.ss.tile_h))
         self._last_jumped = 0
         self._is_grounded = True
         self._is_collide_bottom_history = collections.deque(maxlen=5)
-        self.walk_anim = player_walk_anim
+        self.walk_anim = walk_anim
         self.is_flipped = False
         self.state = PlayerState.STANDING
+        self._image_key = (self.ss, 0, False)
+        self.prev_position = position
+
+    @property
+    def rect(self):
+        # Mirrors the store after each update, so move the player through
+        # position rather than by writing to the rect
+        return self.entities.rects[self.row]
+
+    @property
+    def position(self):
+        return self.rect.topleft
+
+    @position.setter
+    def position(self, position):
+        self.entities.set_position(self.row, position)
+
+    @property
+    def velocity(self):
+        return (self.entities.vxs[self.row], self.entities.vys[self.row])
+
+    @velocity.setter
+    def velocity(self, velocity):
+        self.entities.vxs[self.row], self.entities.vys[self.row] = velocity
 
-    def update(self, blocks_list):
-        if self.state == PlayerState.STANDING:
-            self.image = self.ss.image_at(0)
-        elif self.state == PlayerState.WALKING:
-            self.walk_anim.update()
-            self.image = self.ss.image_at(
-                self.walk_anim.get_current_tile_idx())
-        if self.state == PlayerState.JUMPING:
-            self.image = self.ss.image_at(1)
-
-        if self.is_flipped:
-            self.image = pygame.transform.flip(self.image, True, False)
-
-        is_collide_bottom = False
-
-        self.velocity = vec2.add(self.velocity, GRAVITY_ACC)
-
-        if abs(self.velocity[0]) > 0:
-            drag_v = (-DRAG if self.velocity[0] > 0 else DRAG, 0)
-            self.velocity = vec2.add(self.velocity, drag_v)
-
-        self.rect.center = vec2.add(self.rect.center, self.velocity)
-
-        # Collide player with ground
-        blocks_hit_list = pygame.sprite.spritecollide(
-            self, blocks_list, False)
-        if blocks_hit_list:
-            for hit_block in blocks_hit_list:
-                # Make sure player is always outside of block
-                left_dist = abs(self.rect.right - hit_block.rect.left)
-                right_dist = abs(self.rect.left - hit_block.rect.right)
-                top_dist = abs(self.rect.bottom - hit_block.rect.top)
-                bottom_dist = abs(self.rect.top - hit_block.rect.bottom)
-                min_idx = utils.argmin(
-                    [top_dist, bottom_dist, left_dist, right_dist]
-                )
-                if min_idx == 0:
-                    self.rect.bottom = hit_block.rect.top
-                    self.velocity = (self.velocity[0], 0)
-                    is_collide_bottom = True
-                    self.state = PlayerState.STANDING
-                elif min_idx == 1:
-                    self.rect.top = hit_block.rect.bottom
-                    self.velocity = (self.velocity[0], 0)
-                elif min_idx == 2:
-                    self.rect.right = hit_block.rect.left
-                    self.velocity = (0, self.velocity[1])
-                elif min_idx == 3:
-                    self.rect.left = hit_block.rect.right
-                    self.velocity = (0, self.velocity[1])
+    def get_render_position(self, alpha):
+        return vec2.lerp(self.prev_position, self.rect.topleft, alpha)
 
+    def update(self):
+        self.prev_position = self.rect.topleft
+        tile_idx = 0
+        if self.state == PlayerState.WALKING:
+            tile_idx = self.walk_anim.get_current_tile_idx()
+        elif self.state == PlayerState.JUMPING:
+            tile_idx = 1
+
+        # Only swap the shared frame when the sheet, frame or facing changes
+        image_key = (self.ss, tile_idx, self.is_flipped)
+        if image_key != self._image_key:
+            self._image_key = image_key
+            self.image = self.ss.image_at(tile_idx, flip_x=self.is_flipped)
+
+    def update_contacts(self):
+        # Runs after the entity store has stepped this tick
+        is_collide_bottom = self.entities.is_collide_bottom[self.row]
+        if is_collide_bottom:
+            self.state = PlayerState.STANDING
         self._is_collide_bottom_history.append(is_collide_bottom)
         self._is_grounded = len([
             x for x in self._is_collide_bottom_history if x
@@ -239,33 +193,99 @@ class Player(pygame.sprite.Sprite):
         self.velocity = (-PLAYER_SPEED, self.velocity[1])
 
     def jump(self, strength):
-        now = pygame.time.get_ticks()
+        now = animation_clock.now_ms
         time_diff = now - self._last_jumped
         if self._is_grounded and time_diff >= JUMP_COOLDOWN:
-            self._last_jumped = pygame.time.get_ticks()
-            self.velocity = vec2.add(self.velocity, (0, -strength))
-
-
-def main():
+            self._last_jumped = now
+            # Replaces whatever the player was settling into the ground with,
+            # less a tick of gravity, which is the arc whole pixel positions
+            # used to give
+            self.velocity = (self.velocity[0], GRAVITY_ACC[1] - strength)
+
+
+def draw_loading_screen(screen, progress):
+    screen.fill((0, 0, 0))
+    bar_rect = pygame.Rect(0, 0, SCREEN_WIDTH // 2, 4)
+    bar_rect.center = SCREEN_CENTER
+    pygame.draw.rect(screen, (255, 255, 255), bar_rect, 1)
+    bar_rect.width = int(bar_rect.width * progress)
+    pygame.draw.rect(screen, (255, 255, 255), bar_rect)
+
+
+def main(is_headless=False, script=None, stats_path=None, record_path=None, replay_path=None, is_fast=False, is_perf_overlay=False, telemetry_path=None, is_dirty_rects=DIRTY_RECTS):
+    # Uncapped runs step exactly one tick per frame as fast as they can
+    is_fast = is_fast or is_headless
+    if is_headless:
+        os.environ["SDL_VIDEODRIVER"] = "dummy"
+        os.environ["SDL_AUDIODRIVER"] = "dummy"
     pygame.init()
     pygame.display.set_caption(f"Get to Work - v{VERSION}")
-    icon_img = pygame.image.load(os.path.join(
-        utils.get_resource_path(), "assets/images/icon.ico"))
+    icon_img = assets.image("assets/images/icon.ico")
     pygame.display.set_icon(icon_img)
+    # The dummy driver has nothing to scale to
     screen = pygame.display.set_mode(
-        SCREEN_SIZE, pygame.SCALED | pygame.RESIZABLE
+        SCREEN_SIZE, 0 if is_headless else pygame.SCALED | pygame.RESIZABLE
     )
     clock = pygame.time.Clock()
 
+    # Loaded after set_mode so images are converted to the display format
+    tiles_ss_handle = assets.load_async(
+        assets.spritesheet, "assets/spritesheets/tiles.dat")
+    player_office_ss_handle = assets.load_async(
+        assets.spritesheet, "assets/spritesheets/player_office.dat")
+    player_pjs_ss_handle = assets.load_async(
+        assets.spritesheet, "assets/spritesheets/player_pjs.dat")
+    player_walk_anim_handle = assets.load_async(
+        Animation, "assets/animations/player_walk.dat")
+    textbox_handle = assets.load_async(Textbox)
+    ending_screen_handle = assets.load_async(EndingScreen, SCREEN_SIZE)
+    lvl_handle = assets.load_async(
+        Level, "assets/levels/level01.dat", is_streaming=True)
+
+    handles = [
+        tiles_ss_handle,
+        player_office_ss_handle,
+        player_pjs_ss_handle,
+        player_walk_anim_handle,
+        textbox_handle,
+        ending_screen_handle,
+        lvl_handle,
+    ]
+    while not all(handle.is_ready() for handle in handles):
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                pygame.quit()
+                return
+        draw_loading_screen(
+            screen,
+            len([handle for handle in handles if handle.is_ready()]) /
+            len(handles),
+        )
+        pygame.display.flip()
+        clock.tick(60)
+
+    tiles_ss = tiles_ss_handle.get()
+    player_office_ss = player_office_ss_handle.get()
+    player_pjs_ss = player_pjs_ss_handle.get()
+    player_walk_anim = player_walk_anim_handle.get()
+
     game_manager = GameManager(GameState.PLAYER_CONTROL)
 
-    textbox = Textbox()
-    fader = Fader(color=(0, 0, 0))
+    textbox = textbox_handle.get()
+    fader = Fader(SCREEN_SIZE, color=(0, 0, 0))
     fader.fade_in()
 
-    ending_screen = EndingScreen()
+    ending_screen = ending_screen_handle.get()
+
+    overlays = OverlayCompositor([fader, ending_screen])
 
-    player = Player(position=(-48, 0))
+    entities = EntityStore(GRAVITY_ACC, DRAG)
+    player = Player(
+        position=(-48, 0),
+        ss=player_pjs_ss,
+        walk_anim=player_walk_anim,
+        entities=entities,
+    )
     player_group = pygame.sprite.Group()
     player_group.add(player)
 
@@ -308,7 +328,7 @@ def main():
             },
             {
                 "speaker": "Ada",
-                "text": "At least I put my suit on the drawer.\n\nAll I need to do is walk over to it and press (Z) to put it on.",
+                "text": "At least I put my suit on the drawer.\nAll I need to do is walk over to it and press (Z) to put it on.",
             },
         ],
         pre_dialogue=start_pre,
@@ -323,7 +343,7 @@ def main():
     clothes_npc = NPC(ss=tiles_ss, tile_idx=43, position=(32, -16), is_single_talk=True, dialogue=[
         {
             "speaker": "Ada",
-            "text": "God I hate this suit.\n\nI wish it was Wear Your Pajamas to Work Day.",
+            "text": "God I hate this suit.\nI wish it was Wear Your Pajamas to Work Day.",
         },
         {
             "speaker": "Ada",
@@ -390,7 +410,7 @@ def main():
         },
         {
             "speaker": "???",
-            "text": "I did not build it. I did not build it. I did not build it. I did not build it.\n\nI am not responsible. I am not responsible. I am not responsible.",
+            "text": "I did not build it. I did not build it. I did not build it. I did not build it.\nI am not responsible. I am not responsible. I am not responsible.",
         },
         {
             "speaker": "Ada",
@@ -406,7 +426,7 @@ def main():
         },
         {
             "speaker": "Sign",
-            "text": "Come and take a break at Franz's Coffee!\n\nYou can find us just down this ledge!",
+            "text": "Come and take a break at Franz's Coffee!\nYou can find us just down this ledge!",
         },
         {
             "speaker": "Sign",
@@ -426,15 +446,15 @@ def main():
         },
         {
             "speaker": "???",
-            "text": "Small-scale graviton tests were a success. Observations were\n\nwithin 2 microns of predictions theorized by the Weiss-Sakae\n\nconjecture.",
+            "text": "Small-scale graviton tests were a success. Observations were within 2 microns of predictions theorized by the Weiss-Sakae conjecture.",
         },
         {
             "speaker": "???",
-            "text": "Tomorrow we will begin our first practical field tests.\n\nTeam is apprehensive. They say it's too risky. They say\n\nwe are playing God.",
+            "text": "Tomorrow we will begin our first practical field tests.\nTeam is apprehensive. They say it's too risky. They say we are playing God.",
         },
         {
             "speaker": "???",
-            "text": "However, it is too late to stop.\n\nWe must march on whether we like it or not.",
+            "text": "However, it is too late to stop.\nWe must march on whether we like it or not.",
         },
         {
             "speaker": "Ada",
@@ -446,7 +466,7 @@ def main():
     sign6_npc = NPC(ss=tiles_ss, tile_idx=47, position=(2464, 208), dialogue=[
         {
             "speaker": "Sign",
-            "text": "Franz's Coffee\n\nHome of the best macchiato in the Aether!",
+            "text": "Franz's Coffee\nHome of the best macchiato in the Aether!",
         },
     ])
     npcs.append(sign6_npc)
@@ -462,11 +482,11 @@ def main():
         },
         {
             "speaker": "???",
-            "text": "Empirical tests are not looking good. Numbers are off from\n\nprediction by 2-6 microns.",
+            "text": "Empirical tests are not looking good. Numbers are off from prediction by 2-6 microns.",
         },
         {
             "speaker": "???",
-            "text": "The machine needs to change, but the engineers say it's too\n\nlate to modify spec.",
+            "text": "The machine needs to change, but the engineers say it's too late to modify spec.",
         },
         {
             "speaker": "???",
@@ -474,7 +494,7 @@ def main():
         },
         {
             "speaker": "???",
-            "text": "We can only hope that these mistakes do not blossom into\n\n irreversible catastrophe.",
+            "text": "We can only hope that these mistakes do not blossom into irreversible catastrophe.",
         },
         {
             "speaker": "Ada",
@@ -505,15 +525,15 @@ def main():
                 },
                 {
                     "speaker": "???",
-                    "text": "Ada worked a full 8 hours that day, and slipped out\n\njust before 6.",
+                    "text": "Ada worked a full 8 hours that day, and slipped out just before 6.",
                 },
                 {
                     "speaker": "???",
-                    "text": "Walking down the street hop in step, a crazy thought\n\nsuddenly entered her head.",
+                    "text": "Walking down the street hop in step, a crazy thought suddenly entered her head.",
                 },
                 {
                     "speaker": "???",
-                    "text": "However, it was a trifle matter, soon lost to time like many\n\nothers.",
+                    "text": "However, it was a trifle matter, soon lost to time like many others.",
                 },
             ], ending_cb)
         elif game_manager.left_home_flag and not game_manager.office_clothes_flag:
@@ -530,7 +550,7 @@ def main():
                 },
                 {
                     "speaker": "???",
-                    "text": "Although, in her haste she had forgotten to change out of her\n\npajamas.",
+                    "text": "Although, in her haste she had forgotten to change out of her pajamas.",
                 },
                 {
                     "speaker": "???",
@@ -559,7 +579,7 @@ def main():
                 },
                 {
                     "speaker": "???",
-                    "text": "What? I don't know how you did it either.\n\nMaybe file a bug or something...",
+                    "text": "What? I don't know how you did it either.\nMaybe file a bug or something...",
                 },
                 {
                     "speaker": "???",
@@ -603,7 +623,7 @@ def main():
             },
             {
                 "speaker": "???",
-                "text": "No one, not even her close friends and family, had a clue as to\n\nwhy she would have jumped in the first place.",
+                "text": "No one, not even her close friends and family, had a clue as to why she would have jumped in the first place.",
             },
             {
                 "speaker": "???",
@@ -611,7 +631,7 @@ def main():
             },
             {
                 "speaker": "???",
-                "text": "Whatever the case, the Earth continued to spin\n\nand life moved on.",
+                "text": "Whatever the case, the Earth continued to spin and life moved on.",
             },
         ], ending_cb)
 
@@ -625,138 +645,252 @@ def main():
     )
     autotalk_npcs.append(pit_ender_npc)
 
-    npc_group = pygame.sprite.Group()
-    npc_group.add(npcs)
-    autotalk_npc_group = pygame.sprite.Group()
-    autotalk_npc_group.add(autotalk_npcs)
+    npc_scheduler = UpdateScheduler(npcs + autotalk_npcs)
+    npc_index = TriggerIndex(npcs)
+    autotalk_index = TriggerIndex(autotalk_npcs)
 
     cam = Camera(player, (20, 20))
 
-    lvl = Level("assets/levels/level01.dat")
+    lvl = lvl_handle.get()
+
+    renderer = Renderer(screen, BACKGROUND, is_dirty_rects=is_dirty_rects)
 
-    is_k_left_down = False
-    is_k_right_down = False
-    is_k_up_down = False
+    # Every session starts from the same simulation time, so recordings
+    # replay against the same timers
+    animation_clock.reset()
+
+    input_state = replay.InputState()
     jump_start_time = 0
+    scripted_input = ScriptedInput(script) if script is not None else None
+    recorder = replay.InputRecorder(TICK_RATE) if record_path else None
+    input_replay = replay.InputReplay(
+        replay_path, TICK_RATE) if replay_path else None
+    timer = perf.PhaseTimer()
+    perf_overlay = PerfOverlay(timer, perf.PHASES, perf.COUNTERS)
+    perf_overlay.is_enabled = is_perf_overlay
+    telemetry = perf.TelemetryWriter(telemetry_path) if telemetry_path else None
+    if telemetry:
+        timer.listeners.append(telemetry.write)
+    total_ticks = 0
+    start_time = time.perf_counter()
+    accumulator_ms = 0
+    last_ms = pygame.time.get_ticks()
     running = True
     while running:
         now = pygame.time.get_ticks()
+        if is_fast:
+            accumulator_ms += TICK_MS
+        else:
+            accumulator_ms += now - last_ms
+        last_ms = now
 
         # Events
+        timer.begin("events")
         for event in pygame.event.get():
             if event.type == pygame.QUIT:
                 running = False
-            elif event.type == pygame.KEYDOWN:
-                if event.key == pygame.K_LEFT:
-                    is_k_left_down = True
-                if event.key == pygame.K_RIGHT:
-                    is_k_right_down = True
-                if event.key == pygame.K_UP:
-                    jump_start_time = pygame.time.get_ticks()
-                    is_k_up_down = True
-                if event.key == pygame.K_z:
-                    if game_manager.game_state == GameState.PLAYER_CONTROL:
-                        hit_npcs = pygame.sprite.spritecollide(
-                            player, npc_group, False)
-                        if hit_npcs:
-                            hit_npc = hit_npcs[0]
-                            if hit_npc.can_talk():
-                                hit_npc.talk(textbox)
-                                if hit_npc.is_talking:
-                                    game_manager.game_state = GameState.TEXTBOX_CONTROL
-                                elif textbox.callback:
-                                    textbox.callback()
-                    elif game_manager.game_state == GameState.TEXTBOX_CONTROL:
-                        if textbox.has_next_line():
-                            textbox.move_next_line()
-                        else:
-                            game_manager.game_state = GameState.PLAYER_CONTROL
-                            textbox.is_visible = False
-                            textbox.callback()
-            elif event.type == pygame.KEYUP:
-                if event.key == pygame.K_LEFT:
-                    is_k_left_down = False
-                if event.key == pygame.K_RIGHT:
-                    is_k_right_down = False
-                if event.key == pygame.K_UP:
-                    is_k_up_down = False
-                    if game_manager.game_state == GameState.PLAYER_CONTROL:
-                        time_diff = now - jump_start_time
-                        strength = time_diff_to_strength(time_diff)
-                        player.jump(strength)
-
-        hit_npcs = pygame.sprite.spritecollide(
-            player, autotalk_npcs, False)
-        if hit_npcs:
-            hit_npc = hit_npcs[0]
-            if hit_npc.can_talk():
-                hit_npc.talk(textbox)
-                if hit_npc.is_talking:
-                    game_manager.game_state = GameState.TEXTBOX_CONTROL
-                elif textbox.callback:
-                    textbox.callback()
-
-        # Update
-        if game_manager.game_state == GameState.PLAYER_CONTROL:
-            if is_k_left_down:
-                player.move_left()
-            if is_k_right_down:
-                player.move_right()
-            time_diff = now - jump_start_time
-            if is_k_up_down and time_diff >= JUMP_COOLDOWN:
-                strength = time_diff_to_strength(time_diff)
-                player.jump(strength)
-        elif game_manager.game_state == GameState.TEXTBOX_CONTROL:
-            textbox.update()
-        player_group.update(lvl.collidable_block_group)
-        lvl.collidable_block_group.update()
-        npc_group.update()
-        autotalk_npc_group.update()
-        cam.update()
-        fader.update()
-        ending_screen.update()
-
-        # Render
-        screen.fill(BACKGROUND)
-        for layer in lvl.layers:
-            for b in layer["collidable_blocks"]:
-                if is_block_on_screen(b, cam):
-                    screen.blit(b.image, to_screen_coords(
-                        b.rect.topleft, cam))
-            for b in layer["noncollidable_blocks"]:
-                if is_block_on_screen(b, cam):
-                    screen.blit(b.image, to_screen_coords(
-                        b.rect.topleft, cam))
-        for npc in npcs:
-            screen.blit(npc.image, to_screen_coords(npc.rect.topleft, cam))
-        for npc in autotalk_npcs:
-            screen.blit(npc.image, to_screen_coords(npc.rect.topleft, cam))
-        screen.blit(player.image, to_screen_coords(
-            player.rect.topleft, cam))
-        screen.blit(fader.image, (0, 0))
-        screen.blit(ending_screen.image, (0, 0))
+            elif event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                perf_overlay.toggle()
+            elif event.type in (pygame.KEYDOWN, pygame.KEYUP):
+                input_state.handle_key(event.type, event.key)
+
+        # Update at a fixed tick rate, running several ticks to catch up
+        # after a slow frame instead of slowing the game down
+        timer.begin("update")
+        ticks = 0
+        while accumulator_ms >= TICK_MS:
+            if ticks == MAX_TICKS_PER_FRAME:
+                # Too far behind to catch up, so drop the backlog
+                accumulator_ms = 0
+                break
+            if input_replay:
+                if input_replay.is_done(total_ticks):
+                    running = False
+                    break
+                tick_input = input_replay.get(total_ticks)
+            else:
+                if scripted_input:
+                    # Scripts are timed in ticks, so they play the same
+                    # however fast frames are drawn
+                    if scripted_input.is_done(total_ticks):
+                        running = False
+                        break
+                    for event_type, key in scripted_input.get_events(total_ticks):
+                        input_state.handle_key(event_type, key)
+                tick_input = input_state.get_tick_input()
+            if recorder:
+                recorder.record(tick_input)
+
+            # Input is only read from tick_input from here on, so a recording
+            # replays the same simulation
+            now_ms = animation_clock.now_ms
+            if tick_input & replay.UP_PRESSED:
+                jump_start_time = now_ms
+            if tick_input & replay.Z_PRESSED:
+                if game_manager.game_state == GameState.PLAYER_CONTROL:
+                    hit_npcs = npc_index.query(player.rect)
+                    if hit_npcs:
+                        hit_npc = hit_npcs[0]
+                        if hit_npc.can_talk():
+                            hit_npc.talk(textbox)
+                            if hit_npc.is_talking:
+                                game_manager.game_state = GameState.TEXTBOX_CONTROL
+                            elif textbox.callback:
+                                textbox.callback()
+                elif game_manager.game_state == GameState.TEXTBOX_CONTROL:
+                    if textbox.has_next_line():
+                        textbox.move_next_line()
+                    else:
+                        game_manager.game_state = GameState.PLAYER_CONTROL
+                        textbox.is_visible = False
+                        textbox.callback()
+            if tick_input & replay.UP_RELEASED:
+                if game_manager.game_state == GameState.PLAYER_CONTROL:
+                    time_diff = now_ms - jump_start_time
+                    strength = time_diff_to_strength(time_diff)
+                    player.jump(strength)
+
+            # Auto-talk regions fire when the player enters them
+            entered_npcs, _ = autotalk_index.update(player.rect)
+            if entered_npcs:
+                hit_npc = entered_npcs[0]
+                if hit_npc.can_talk():
+                    hit_npc.talk(textbox)
+                    if hit_npc.is_talking:
+                        game_manager.game_state = GameState.TEXTBOX_CONTROL
+                    elif textbox.callback:
+                        textbox.callback()
+
+            if game_manager.game_state == GameState.PLAYER_CONTROL:
+                if tick_input & replay.LEFT:
+                    player.move_left()
+                if tick_input & replay.RIGHT:
+                    player.move_right()
+                time_diff = now_ms - jump_start_time
+                if tick_input & replay.UP and time_diff >= JUMP_COOLDOWN:
+                    strength = time_diff_to_strength(time_diff)
+                    player.jump(strength)
+            elif game_manager.game_state == GameState.TEXTBOX_CONTROL:
+                textbox.update()
+            animation_clock.tick(TICK_MS)
+            player_group.update()
+            timer.begin("collision")
+            entities.update(lvl, PHYSICS_SUBSTEPS)
+            timer.begin("update")
+            player.update_contacts()
+            cam.update()
+            npc_scheduler.update(get_view_rect(cam.position))
+            overlays.update()
+            accumulator_ms -= TICK_MS
+            ticks += 1
+            total_ticks += 1
+
+        # Render between the last two ticks when drawing faster than the tick rate
+        timer.begin("world")
+        alpha = accumulator_ms / TICK_MS
+        cam_position = cam.get_render_position(alpha)
+        view_rect = get_view_rect(cam_position)
+        lvl.stream_chunks(view_rect)
+        draws = []
+        visible_images, blocks_culled = lvl.get_visible_images(view_rect)
+        for position, img in visible_images:
+            draws.append(
+                (img, to_screen_coords(position, cam_position), None))
+        npcs_culled = 0
+        for npc in npcs + autotalk_npcs:
+            if not view_rect.colliderect(npc.rect):
+                npcs_culled += 1
+                continue
+            draws.append((npc.image, to_screen_coords(
+                npc.rect.topleft, cam_position), None))
+        draws.append((player.image, to_screen_coords(
+            player.get_render_position(alpha), cam_position), None))
+
+        timer.begin("overlay")
+        draws.extend(overlays.get_draws())
         if textbox.is_visible:
             textbox_img = textbox.get_image()
-            screen.blit(
+            draws.append((
                 textbox_img,
                 (0, SCREEN_HEIGHT - textbox_img.get_height() - 8),
-            )
-
-        # debug_text = f"DEBUG:\nplayer_position:{player.rect.topleft}"
-        # debug_font = textbox.font
-        # debug_font_size = textbox.font_size
-        # for idx, line in enumerate(debug_text.split("\n")):
-        #     debug_img = debug_font.render(
-        #         line,
-        #         False,
-        #         (0, 0, 0),
-        #     )
-        #     screen.blit(debug_img, (8, 8+debug_font_size*idx))
-
-        pygame.display.flip()
-        clock.tick(60)
+                textbox.image_version,
+            ))
+        perf_overlay.update()
+        if perf_overlay.is_visible():
+            draws.append((
+                perf_overlay.image,
+                perf_overlay.rect.topleft,
+                perf_overlay.get_state(),
+            ))
+        timer.count("blits", len(draws))
+        timer.count("blocks_culled", blocks_culled)
+        timer.count("npcs_culled", npcs_culled)
+
+        timer.begin("present")
+        is_presented = renderer.present(draws)
+        timer.end_frame()
+        if not is_fast:
+            # Nothing changed, so there's nothing new to draw before the
+            # next tick
+            clock.tick(MAX_FPS if is_presented else TICK_RATE)
     pygame.quit()
 
+    if recorder:
+        recorder.save(record_path)
+    if telemetry:
+        telemetry.close()
+
+    if stats_path:
+        seconds = time.perf_counter() - start_time
+        with open(stats_path, "w") as f:
+            json.dump({
+                "frames": timer.frame_count,
+                "ticks": total_ticks,
+                "seconds": seconds,
+                "ticks_per_sec": total_ticks / seconds,
+                "phases": timer.get_summary(),
+            }, f, indent=2)
+
+
+def parse_args():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--headless", action="store_true",
+        help="run without a window or frame cap")
+    parser.add_argument(
+        "--script",
+        help='scripted input, e.g. "hold RIGHT 120, tap UP"')
+    parser.add_argument(
+        "--stats", help="write timing stats as JSON to this path on exit")
+    parser.add_argument(
+        "--record", help="record per-tick input to this path on exit")
+    parser.add_argument(
+        "--replay", help="play back input recorded with --record")
+    parser.add_argument(
+        "--fast", action="store_true",
+        help="run ticks as fast as possible instead of in real time")
+    parser.add_argument(
+        "--perf", action="store_true",
+        help="start with the performance overlay shown (toggle with F3)")
+    parser.add_argument(
+        "--telemetry",
+        help="stream per-frame timings to this .csv or .jsonl path")
+    parser.add_argument(
+        "--dirty-rects", action="store_true", default=DIRTY_RECTS,
+        help="redraw only the parts of the screen that changed")
+    return parser.parse_args()
+
 
 if __name__ == "__main__":
-    main()
+    args = parse_args()
+    main(
+        is_headless=args.headless,
+        script=args.script,
+        stats_path=args.stats,
+        record_path=args.record,
+        replay_path=args.replay,
+        is_fast=args.fast,
+        is_perf_overlay=args.perf,
+        telemetry_path=args.telemetry,
+        is_dirty_rects=args.dirty_rects,
+    )
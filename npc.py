@@ -5,15 +5,17 @@ class NPC(pygame.sprite.Sprite):
     def __init__(self, ss, tile_idx, position, rect=None, anim=None, is_single_talk=False, dialogue=[], pre_dialogue=None, post_dialogue=None):
         super().__init__()
         self.ss = ss
-        self.tile_idx = tile_idx
         if rect:
             self.rect = rect
         else:
             self.rect = pygame.Rect(
                 (0, 0), (self.ss.tile_w, self.ss.tile_h))
         self.rect.topleft = position
-        self.image = self._get_image()
+        self._blank_img = None
+        self.tile_idx = tile_idx
         self.anim = anim
+        # Only animated NPCs need per-tick updates
+        self.is_static = anim is None
         self.dialogue = dialogue
         self.is_single_talk = is_single_talk
         self.is_talked_once = False
@@ -47,14 +49,29 @@ class NPC(pygame.sprite.Sprite):
             self.post_dialogue,
         )
 
-    def update(self):
+    @property
+    def tile_idx(self):
+        return self._tile_idx
+
+    @tile_idx.setter
+    def tile_idx(self, tile_idx):
+        # The image follows the tile as soon as it's set, so static NPCs
+        # never need to be updated
+        self._tile_idx = tile_idx
         self.image = self._get_image()
 
+    def update(self):
+        tile_idx = self.anim.get_current_tile_idx()
+        if tile_idx != self.tile_idx:
+            self.tile_idx = tile_idx
+
     def _get_image(self):
         if self.tile_idx == -1:
-            # TODO: remove image after debug
-            img = pygame.Surface(self.rect.size, pygame.SRCALPHA)
-            # img.fill((255, 0, 255))
-            return img
+            if self._blank_img is None:
+                # TODO: remove image after debug
+                self._blank_img = pygame.Surface(
+                    self.rect.size, pygame.SRCALPHA)
+                # self._blank_img.fill((255, 0, 255))
+            return self._blank_img
         else:
             return self.ss.image_at(self.tile_idx)
@@ -0,0 +1,147 @@
+import pygame
+from asset_manager import assets
+from animation import animation_clock
+
+
+class Fader(pygame.sprite.Sprite):
+    def __init__(self, size, color=(0, 0, 0), delta=5):
+        super().__init__()
+        self.rect = pygame.Rect((0, 0), size)
+        # Opaque surface faded with surface alpha, which blits much cheaper
+        # than a per-pixel alpha surface
+        self.image = pygame.Surface(self.rect.size)
+        self.image.fill(color)
+        self.alpha = 255
+        self.image.set_alpha(self.alpha)
+        self.target_alpha = self.alpha
+        self.delta = delta
+
+    def fade_in(self):
+        self.target_alpha = 0
+
+    def fade_out(self):
+        self.target_alpha = 255
+
+    def is_visible(self):
+        return self.alpha > 0
+
+    def get_state(self):
+        return self.alpha
+
+    def update(self):
+        if self.alpha == self.target_alpha:
+            return
+        if self.alpha < self.target_alpha:
+            self.alpha = min(self.alpha + self.delta, self.target_alpha)
+        else:
+            self.alpha = max(self.alpha - self.delta, self.target_alpha)
+        self.image.set_alpha(self.alpha)
+
+
+class EndingScreen(pygame.sprite.Sprite):
+    def __init__(self, size):
+        super().__init__()
+        self.font = assets.glyph_atlas(
+            "assets/fonts/Grand9K Pixel.ttf", 10, (255, 255, 255))
+        self.rect = pygame.Rect((0, 0), size)
+        self.image = None
+        self.ending_text = "THE END"
+        self.start_ms = -1
+        self.is_playing = False
+        self.callback = None
+
+    def play(self, ending_text, callback=None):
+        self.start_ms = animation_clock.now_ms
+        self.is_playing = True
+        self.ending_text = ending_text
+        self.callback = callback
+        # The text only changes here, so it's rendered once per play
+        self.image = pygame.Surface(self.rect.size)
+        self.image.fill((0, 0, 0))
+        lines = self.ending_text.split("\n")
+        for idx, text in enumerate(lines):
+            text_w, text_h = self.font.size(text)
+            self.font.blit_text(self.image, text, (
+                self.rect.width // 2 - text_w // 2,
+                self.rect.height // 2 - text_h // 2 + 10*idx,
+            ))
+
+    def is_visible(self):
+        return self.is_playing
+
+    def get_state(self):
+        return None
+
+    def update(self):
+        if self.is_playing:
+            now = animation_clock.now_ms
+            if now - self.start_ms > 100:
+                if self.callback:
+                    self.callback()
+
+
+class OverlayCompositor:
+    def __init__(self, overlays):
+        self.overlays = overlays
+
+    def update(self):
+        for overlay in self.overlays:
+            overlay.update()
+
+    def get_draws(self):
+        # Invisible overlays are skipped entirely rather than blitted clear
+        return [
+            (overlay.image, overlay.rect.topleft, overlay.get_state())
+            for overlay in self.overlays
+            if overlay.is_visible()
+        ]
+
+
+class PerfOverlay(pygame.sprite.Sprite):
+    def __init__(self, timer, phases, counters, refresh_frames=15):
+        super().__init__()
+        self.font = assets.glyph_atlas(
+            "assets/fonts/Grand9K Pixel.ttf", 8, (255, 255, 255))
+        self.timer = timer
+        self.phases = phases
+        self.counters = counters
+        self.refresh_frames = refresh_frames
+        self.is_enabled = False
+        line_count = len(phases) + len(counters) + 1
+        self.rect = pygame.Rect(4, 4, 96, self.font.height * line_count + 4)
+        self.image = pygame.Surface(self.rect.size)
+        self.image.set_alpha(192)
+        self.version = 0
+        self._rendered_frame = None
+
+    def toggle(self):
+        self.is_enabled = not self.is_enabled
+
+    def is_visible(self):
+        return self.is_enabled
+
+    def get_state(self):
+        return self.version
+
+    def update(self):
+        # Redrawn every few frames, both to stay readable and so the readout
+        # doesn't add much to what it's measuring
+        if not self.is_enabled:
+            return
+        frame = self.timer.frame_count
+        if self._rendered_frame is not None and frame - self._rendered_frame < self.refresh_frames:
+            return
+        self._rendered_frame = frame
+        rolling = self.timer.get_rolling()
+        if not rolling:
+            return
+        frame_ms = rolling["frame_ms"]
+        fps = 1000 / frame_ms if frame_ms else 0
+        lines = [f"{frame_ms:.1f}ms {fps:.0f}fps"]
+        lines += [f"{phase} {rolling[phase]:.2f}ms" for phase in self.phases]
+        lines += [f"{counter} {rolling[counter]:.0f}" for counter in self.counters]
+        self.image.fill((0, 0, 0))
+        for idx, line in enumerate(lines):
+            self.font.blit_text(
+                self.image, line, (2, 2 + self.font.height * idx))
+        self.version += 1
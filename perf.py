@@ -0,0 +1,102 @@
+import csv
+import json
+import time
+import collections
+
+PHASES = ("events", "update", "collision", "world", "overlay", "present")
+COUNTERS = ("blits", "blocks_culled", "npcs_culled")
+# Frames averaged for the on-screen readout
+ROLLING_FRAMES = 60
+
+
+class PhaseTimer:
+    def __init__(self):
+        self.frame_count = 0
+        self.phase_totals = {}
+        self.phase_maxes = {}
+        self.frame_phases = {}
+        self.frame_counters = {}
+        self.samples = collections.deque(maxlen=ROLLING_FRAMES)
+        self.listeners = []
+        self._phase = None
+        self._start = 0
+        self._last_frame_end = time.perf_counter()
+
+    def begin(self, phase):
+        # Ends whichever phase is running and starts timing the next one
+        now = time.perf_counter()
+        self._record(now)
+        self._phase = phase
+        self._start = now
+
+    def _record(self, now):
+        if self._phase is not None:
+            self.frame_phases[self._phase] = self.frame_phases.get(
+                self._phase, 0) + (now - self._start) * 1000
+
+    def count(self, counter, value):
+        self.frame_counters[counter] = self.frame_counters.get(
+            counter, 0) + value
+
+    def end_frame(self):
+        now = time.perf_counter()
+        self._record(now)
+        self._phase = None
+        for phase, ms in self.frame_phases.items():
+            self.phase_totals[phase] = self.phase_totals.get(phase, 0) + ms
+            self.phase_maxes[phase] = max(self.phase_maxes.get(phase, 0), ms)
+        # Frame time runs from one frame end to the next, so it includes
+        # anything outside the timed phases like waiting on the frame cap
+        sample = {
+            "frame": self.frame_count,
+            "frame_ms": (now - self._last_frame_end) * 1000,
+        }
+        for phase in PHASES:
+            sample[phase] = self.frame_phases.get(phase, 0)
+        for counter in COUNTERS:
+            sample[counter] = self.frame_counters.get(counter, 0)
+        self.samples.append(sample)
+        for listener in self.listeners:
+            listener(sample)
+        self._last_frame_end = now
+        self.frame_count += 1
+        self.frame_phases = {}
+        self.frame_counters = {}
+
+    def get_rolling(self):
+        if not self.samples:
+            return {}
+        return {
+            key: sum(sample[key] for sample in self.samples) / len(self.samples)
+            for key in ("frame_ms",) + PHASES + COUNTERS
+        }
+
+    def get_summary(self):
+        return {
+            phase: {
+                "mean_ms": total / self.frame_count,
+                "max_ms": self.phase_maxes[phase],
+            }
+            for phase, total in self.phase_totals.items()
+        }
+
+
+class TelemetryWriter:
+    def __init__(self, path):
+        # CSV for .csv paths, otherwise one JSON object per line
+        self.is_csv = path.endswith(".csv")
+        self.file = open(path, "w", newline="")
+        self.writer = None
+        if self.is_csv:
+            self.writer = csv.DictWriter(
+                self.file, ("frame", "frame_ms") + PHASES + COUNTERS)
+            self.writer.writeheader()
+
+    def write(self, sample):
+        if self.is_csv:
+            self.writer.writerow(sample)
+        else:
+            self.file.write(json.dumps(sample) + "\n")
+
+    def close(self):
+        self.file.close()
@@ -0,0 +1,51 @@
+import pygame
+
+
+class Renderer:
+    def __init__(self, screen, background, is_dirty_rects=False):
+        self.screen = screen
+        self.background = background
+        self.is_dirty_rects = is_dirty_rects
+        self._last_draws = None
+
+    def present(self, draws):
+        # Each draw is (image, screen position, state), where state covers
+        # anything an image can change in place, like its alpha. Returns
+        # whether anything was redrawn
+        if not self.is_dirty_rects:
+            self._draw(draws)
+            pygame.display.flip()
+            return True
+
+        dirty_rects = self._get_dirty_rects(draws)
+        self._last_draws = draws
+        if not dirty_rects:
+            return False
+        self.screen.set_clip(dirty_rects[0].unionall(dirty_rects[1:]))
+        self._draw(draws)
+        self.screen.set_clip(None)
+        pygame.display.update(dirty_rects)
+        return True
+
+    def _draw(self, draws):
+        self.screen.fill(self.background)
+        self.screen.blits(
+            [(img, position) for img, position, _ in draws], False)
+
+    def _get_dirty_rects(self, draws):
+        screen_rect = self.screen.get_rect()
+        if self._last_draws is None or len(draws) != len(self._last_draws):
+            return [screen_rect]
+        # Camera scrolls move every world draw, which dirties the whole screen
+        dirty_rects = []
+        for draw, last_draw in zip(draws, self._last_draws):
+            img, position, state = draw
+            last_img, last_position, last_state = last_draw
+            if img is not last_img or position != last_position or state != last_state:
+                dirty_rects.append(pygame.Rect(
+                    last_position, last_img.get_size()))
+                dirty_rects.append(pygame.Rect(position, img.get_size()))
+        return [
+            rect.clip(screen_rect) for rect in dirty_rects
+            if rect.colliderect(screen_rect)
+        ]
@@ -0,0 +1,87 @@
+import struct
+from array import array
+import pygame
+from level_compiler import encode_rle, decode_rle
+
+MAGIC = b"GTWR"
+VERSION = 1
+# magic, version, tick rate, tick count
+HEADER_FORMAT = "<4sHHI"
+HEADER_SIZE = struct.calcsize(HEADER_FORMAT)
+
+# Each tick's input is one byte of held keys and presses since the last tick
+LEFT = 1
+RIGHT = 2
+UP = 4
+Z_PRESSED = 8
+UP_PRESSED = 16
+UP_RELEASED = 32
+
+
+class InputState:
+    def __init__(self):
+        self.is_k_left_down = False
+        self.is_k_right_down = False
+        self.is_k_up_down = False
+        # Key presses wait here until the next tick consumes them
+        self.pressed_input = 0
+
+    def handle_key(self, event_type, key):
+        is_down = event_type == pygame.KEYDOWN
+        if key == pygame.K_LEFT:
+            self.is_k_left_down = is_down
+        elif key == pygame.K_RIGHT:
+            self.is_k_right_down = is_down
+        elif key == pygame.K_UP:
+            self.is_k_up_down = is_down
+            self.pressed_input |= UP_PRESSED if is_down else UP_RELEASED
+        elif key == pygame.K_z and is_down:
+            self.pressed_input |= Z_PRESSED
+
+    def get_tick_input(self):
+        tick_input = self.pressed_input
+        if self.is_k_left_down:
+            tick_input |= LEFT
+        if self.is_k_right_down:
+            tick_input |= RIGHT
+        if self.is_k_up_down:
+            tick_input |= UP
+        self.pressed_input = 0
+        return tick_input
+
+
+class InputRecorder:
+    def __init__(self, tick_rate):
+        self.tick_rate = tick_rate
+        self.inputs = array("B")
+
+    def record(self, tick_input):
+        self.inputs.append(tick_input)
+
+    def save(self, path):
+        # Held keys repeat for long stretches, so ticks are run-length encoded
+        with open(path, "wb") as f:
+            f.write(struct.pack(
+                HEADER_FORMAT, MAGIC, VERSION, self.tick_rate, len(self.inputs)))
+            f.write(encode_rle(self.inputs))
+
+
+class InputReplay:
+    def __init__(self, path, tick_rate):
+        with open(path, "rb") as f:
+            buf = f.read()
+        magic, version, recorded_tick_rate, tick_count = struct.unpack_from(
+            HEADER_FORMAT, buf)
+        if magic != MAGIC:
+            raise ValueError("not an input recording")
+        if version != VERSION:
+            raise ValueError("input recording is from another version")
+        if recorded_tick_rate != tick_rate:
+            raise ValueError("input recording is from another tick rate")
+        self.inputs = decode_rle(buf[HEADER_SIZE:], tick_count)
+
+    def is_done(self, tick):
+        return tick >= len(self.inputs)
+
+    def get(self, tick):
+        return self.inputs[tick]
@@ -0,0 +1,35 @@
+from trigger_index import TriggerIndex
+
+# How far outside the view an entity keeps updating, so it's already
+# animating by the time it scrolls in
+WAKE_MARGIN = 64
+
+
+class UpdateScheduler:
+    def __init__(self, entities=(), wake_margin=WAKE_MARGIN):
+        self.wake_margin = wake_margin
+        self.static_entities = []
+        self._index = TriggerIndex()
+        self.awake_entities = []
+        for entity in entities:
+            self.add(entity)
+
+    def add(self, entity):
+        # Static entities are never updated, everything else sleeps until
+        # it's near the view
+        if getattr(entity, "is_static", False):
+            self.static_entities.append(entity)
+        else:
+            self._index.add(entity)
+
+    def remove(self, entity):
+        if entity in self.static_entities:
+            self.static_entities.remove(entity)
+        else:
+            self._index.remove(entity)
+
+    def update(self, view_rect, *args):
+        self.awake_entities = self._index.query(view_rect.inflate(
+            self.wake_margin * 2, self.wake_margin * 2))
+        for entity in self.awake_entities:
+            entity.update(*args)
@@ -1,28 +1,39 @@
-import os
 import pygame
+from asset_manager import assets
 import utils
 
 
 class Spritesheet:
     def __init__(self, path):
-        with open(os.path.join(utils.get_resource_path(), path), "r") as f:
-            text = f.read()
-        header_data, _ = utils.parse_dat(text)
+        header_data, _ = utils.parse_dat(assets.text(path))
         img_path = header_data["img_path"]
-        self.sheet_img = pygame.image.load(
-            os.path.join(utils.get_resource_path(), img_path))
+        self.sheet_img = assets.image(img_path)
         self.tile_w = int(header_data["tile_w"])
         self.tile_h = int(header_data["tile_h"])
         self.columns = int(header_data["columns"])
 
-    def image_at(self, tile_idx):
-        x = tile_idx % self.columns * self.tile_w
-        y = tile_idx // self.columns * self.tile_h
-        size = (self.tile_w, self.tile_h)
-        sprite_img = pygame.Surface(size, pygame.SRCALPHA)
-        sprite_img.blit(
-            self.sheet_img,
-            (0, 0),
-            (x, y, x + self.tile_w, y + self.tile_h),
-        )
-        return sprite_img
+        # Slice the sheet once into subsurface views that share its pixels
+        self.tiles = []
+        sheet_rect = self.sheet_img.get_rect()
+        blank_img = pygame.Surface((self.tile_w, self.tile_h), pygame.SRCALPHA)
+        rows = sheet_rect.height // self.tile_h
+        for row in range(rows):
+            for col in range(self.columns):
+                tile_rect = pygame.Rect(
+                    col * self.tile_w, row * self.tile_h, self.tile_w, self.tile_h)
+                if sheet_rect.contains(tile_rect):
+                    self.tiles.append(self.sheet_img.subsurface(tile_rect))
+                else:
+                    self.tiles.append(blank_img)
+        self._flipped_cache = {}
+
+    def image_at(self, tile_idx, flip_x=False, flip_y=False):
+        # Frames are shared between all callers, so they must not be drawn on
+        if not flip_x and not flip_y:
+            return self.tiles[tile_idx]
+        key = (tile_idx, flip_x, flip_y)
+        img = self._flipped_cache.get(key)
+        if img is None:
+            img = pygame.transform.flip(self.tiles[tile_idx], flip_x, flip_y)
+            self._flipped_cache[key] = img
+        return img
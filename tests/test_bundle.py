@@ -0,0 +1,37 @@
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import bundle
+
+FILES = {
+    "assets/levels/level01.dat": b"---\nss_path: x\n---\n0.0\n",
+    "assets/images/icon.png": bytes(range(256)) * 4,
+    "assets/empty.txt": b"",
+}
+
+
+def test_bundle_round_trip(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    for path, data in FILES.items():
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, "wb") as f:
+            f.write(data)
+
+    entry_count, _ = bundle.build_bundle("assets", os.path.join("build", bundle.BUNDLE_NAME))
+    assert entry_count == len(FILES)
+
+    pak = bundle.open_bundle("build")
+    assert set(pak.index) == set(FILES)
+    for path, data in FILES.items():
+        assert path in pak
+        assert bytes(pak.read(path)) == data
+        windows_path = path.replace("/", "\\")
+        assert windows_path in pak
+        assert bytes(pak.read(windows_path)) == data
+    assert "assets/missing.png" not in pak
+
+
+def test_open_bundle_without_pak(tmp_path):
+    assert bundle.open_bundle(str(tmp_path)) is None
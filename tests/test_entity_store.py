@@ -0,0 +1,98 @@
+import os
+import sys
+import numpy as np
+import pygame
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from animation import animation_clock
+from entity_store import EntityStore
+
+GRAVITY_ACC = (0, 0.2)
+DRAG = 0.2
+
+
+class FloorLevel:
+    # A single solid floor, standing in for a level's collision queries
+    def __init__(self, floor_rect):
+        self.floor_rect = floor_rect
+
+    def count_solid_cells(self, lefts, tops, rights, bottoms):
+        return ((lefts < self.floor_rect.right) & (rights > self.floor_rect.left)
+                & (tops < self.floor_rect.bottom) & (bottoms > self.floor_rect.top)).astype(np.int64)
+
+    def get_colliders(self, rect):
+        return [self.floor_rect] if rect.colliderect(self.floor_rect) else []
+
+
+def simulate(lvl, substeps, ticks=30):
+    entities = EntityStore(GRAVITY_ACC, DRAG)
+    row = entities.add((0, 0), (16, 16), (2, 0))
+    for _ in range(ticks):
+        entities.update(lvl, substeps)
+    return entities, row
+
+
+@pytest.mark.parametrize("substeps", [2, 4, 8])
+def test_substeps_keep_sub_pixel_movement(substeps):
+    lvl = FloorLevel(pygame.Rect(-1000, 1000, 2000, 16))
+    entities, row = simulate(lvl, 1)
+    sub_entities, sub_row = simulate(lvl, substeps)
+    assert sub_entities.rects[sub_row].x > 0
+    assert abs(sub_entities.xs[sub_row] - entities.xs[row]) < 4
+    assert abs(sub_entities.ys[sub_row] - entities.ys[row]) < 4
+
+
+@pytest.mark.parametrize("substeps", [1, 4])
+def test_lands_on_floor(substeps):
+    lvl = FloorLevel(pygame.Rect(-1000, 40, 2000, 16))
+    entities, row = simulate(lvl, substeps, ticks=60)
+    assert entities.rects[row].bottom == 40
+    assert entities.rects[row].x > 0
+
+
+class PlayerSheet:
+    tile_w = 16
+    tile_h = 16
+
+    def image_at(self, tile_idx, flip_x=False):
+        return pygame.Surface((self.tile_w, self.tile_h))
+
+
+def simulate_player(ticks, walk_ticks, jump_tick=None, strength=5):
+    # Steps the player the way the game loop does, with the game's tuning
+    animation_clock.reset()
+    lvl = FloorLevel(pygame.Rect(-1000, 16, 4000, 16))
+    entities = EntityStore(main.GRAVITY_ACC, main.DRAG)
+    player = main.Player((0, 0), PlayerSheet(), None, entities)
+    positions = []
+    for tick in range(ticks):
+        if tick < walk_ticks:
+            player.move_right()
+        if tick == jump_tick:
+            player.jump(strength)
+        animation_clock.tick(main.TICK_MS)
+        entities.update(lvl, main.PHYSICS_SUBSTEPS)
+        player.update_contacts()
+        positions.append(player.position)
+    return positions
+
+
+def test_walk_speed():
+    positions = simulate_player(60, 50)
+    assert [x for x, _ in positions[:50]] == list(range(2, 102, 2))
+    # Slides to a stop once the key is let go, and stays there
+    assert positions[-1] == (107, 0)
+    assert positions[-3] == positions[-1]
+
+
+@pytest.mark.parametrize("strength, height, air_ticks", [(3, 18, 26), (5, 55, 46)])
+def test_jump_reach(strength, height, air_ticks):
+    positions = simulate_player(120, 120, 20, strength)
+    airborne = [(x, y) for x, y in positions if y < 0]
+    assert -min(y for _, y in airborne) == height
+    assert len(airborne) == air_ticks
+    assert airborne[-1][0] - airborne[0][0] == 2*(air_ticks - 1)
+    assert positions[-1] == (240, 0)
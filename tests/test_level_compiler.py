@@ -0,0 +1,55 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import level_compiler
+
+LEVEL_TEXT = """---
+ss_path: assets/spritesheets/tiles.dat
+offset_x: -16
+offset_y: 0
+collidable_blocks: 0
+---
+0.1.
+0000
+"""
+
+
+@pytest.fixture
+def level_path(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    os.makedirs("assets/levels")
+    path = "assets/levels/test.dat"
+    with open(path, "w") as f:
+        f.write(LEVEL_TEXT)
+    return path
+
+
+def test_compiled_level_matches_source(level_path):
+    level_compiler.compile_file(level_path)
+    assert level_compiler.load_level(level_path) == level_compiler.parse_level(LEVEL_TEXT)
+
+
+@pytest.mark.parametrize("corrupt", [
+    lambda data: data[:-1],
+    lambda data: data[:level_compiler.HEADER_SIZE + 3],
+    lambda data: data[:level_compiler.HEADER_SIZE] + b"\xff" * 64,
+    lambda data: b"garbage",
+])
+def test_corrupt_compiled_level_is_recompiled(level_path, corrupt):
+    data = level_compiler.compile_file(level_path)
+    compiled_path = level_compiler.get_compiled_path(level_path)
+    with open(compiled_path, "wb") as f:
+        f.write(corrupt(data))
+
+    assert level_compiler.load_level(level_path) == level_compiler.parse_level(LEVEL_TEXT)
+    with open(compiled_path, "rb") as f:
+        assert f.read() == data
+
+
+def test_unknown_tile_names_its_position():
+    text = LEVEL_TEXT.replace("0000", "00?0")
+    with pytest.raises(ValueError, match=r"'\?' at row 1, column 2"):
+        level_compiler.parse_level(text)
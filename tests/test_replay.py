@@ -0,0 +1,80 @@
+import os
+import sys
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import replay
+
+TICK_RATE = 60
+
+
+def test_recording_replays_every_tick(tmp_path):
+    # Long held runs, single-tick presses and a run past the 255 RLE limit
+    inputs = ([0] * 10 + [replay.RIGHT] * 300
+              + [replay.RIGHT | replay.UP | replay.UP_PRESSED]
+              + [replay.RIGHT | replay.UP] * 12
+              + [replay.RIGHT | replay.UP_RELEASED, replay.Z_PRESSED, replay.LEFT])
+    recorder = replay.InputRecorder(TICK_RATE)
+    for tick_input in inputs:
+        recorder.record(tick_input)
+    path = str(tmp_path / "session.rec")
+    recorder.save(path)
+
+    input_replay = replay.InputReplay(path, TICK_RATE)
+    assert [input_replay.get(tick) for tick in range(len(inputs))] == inputs
+    assert not input_replay.is_done(len(inputs) - 1)
+    assert input_replay.is_done(len(inputs))
+    assert os.path.getsize(path) < len(inputs)
+
+
+def test_replay_rejects_other_tick_rate(tmp_path):
+    recorder = replay.InputRecorder(TICK_RATE)
+    recorder.record(replay.RIGHT)
+    path = str(tmp_path / "session.rec")
+    recorder.save(path)
+
+    with pytest.raises(ValueError, match="tick rate"):
+        replay.InputReplay(path, TICK_RATE * 2)
+
+
+def test_replay_rejects_bad_magic(tmp_path):
+    recorder = replay.InputRecorder(TICK_RATE)
+    recorder.record(replay.RIGHT)
+    path = str(tmp_path / "session.rec")
+    recorder.save(path)
+    with open(path, "r+b") as f:
+        f.write(b"NOPE")
+
+    with pytest.raises(ValueError, match="not an input recording"):
+        replay.InputReplay(path, TICK_RATE)
+
+
+def run_game(monkeypatch, **kwargs):
+    monkeypatch.setenv("SDL_VIDEODRIVER", "dummy")
+    monkeypatch.setenv("SDL_AUDIODRIVER", "dummy")
+    monkeypatch.chdir(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+    import main
+
+    positions = []
+    update_contacts = main.Player.update_contacts
+
+    def record_position(player):
+        update_contacts(player)
+        positions.append(tuple(player.rect.topleft))
+
+    with monkeypatch.context() as m:
+        m.setattr(main.Player, "update_contacts", record_position)
+        main.main(is_headless=True, **kwargs)
+    return positions
+
+
+def test_replay_matches_recorded_session(tmp_path, monkeypatch):
+    path = str(tmp_path / "session.rec")
+    script = ", ".join(["wait 10, tap Z"] * 7) + \
+        ", down RIGHT, wait 60, hold UP 12, wait 40, hold UP 20, wait 60"
+    recorded = run_game(monkeypatch, script=script, record_path=path)
+    replayed = run_game(monkeypatch, replay_path=path)
+
+    assert len(recorded) > 200
+    assert replayed == recorded
@@ -0,0 +1,55 @@
+import os
+import sys
+import pygame
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from trigger_index import TriggerIndex, CELL_W
+
+
+class Trigger:
+    def __init__(self, x, y, w, h):
+        self.rect = pygame.Rect(x, y, w, h)
+
+
+def test_update_reports_enter_once_then_exit():
+    trigger = Trigger(100, 0, 16, 16)
+    index = TriggerIndex([trigger])
+
+    assert index.update(pygame.Rect(0, 0, 16, 16)) == ([], [])
+    assert index.update(pygame.Rect(95, 0, 16, 16)) == ([trigger], [])
+    assert index.update(pygame.Rect(105, 0, 16, 16)) == ([], [])
+    assert index.update(pygame.Rect(200, 0, 16, 16)) == ([], [trigger])
+    assert index.update(pygame.Rect(100, 0, 16, 16)) == ([trigger], [])
+
+
+def test_hits_keep_insertion_order():
+    triggers = [Trigger(x, 0, 64, 16) for x in (40, 0, 20)]
+    index = TriggerIndex(triggers)
+
+    assert index.query(pygame.Rect(30, 0, 16, 16)) == triggers
+    entered, _ = index.update(pygame.Rect(30, 0, 16, 16))
+    assert entered == triggers
+    _, exited = index.update(pygame.Rect(-100, 0, 16, 16))
+    assert exited == triggers
+
+
+def test_region_spanning_many_cells():
+    pit = Trigger(0, 512, 5000, 32)
+    index = TriggerIndex([pit])
+
+    assert sum(pit in cell for cell in index.cells.values()) == 5000 // CELL_W + 1
+    for x in (-8, 2500, 4990):
+        assert index.query(pygame.Rect(x, 500, 16, 16)) == [pit]
+    assert index.query(pygame.Rect(5000, 500, 16, 16)) == []
+    assert index.query(pygame.Rect(2500, 400, 16, 16)) == []
+
+
+def test_remove_drops_trigger_from_every_cell():
+    pit = Trigger(0, 512, 5000, 32)
+    index = TriggerIndex([pit])
+    index.update(pygame.Rect(100, 512, 16, 16))
+    index.remove(pit)
+
+    assert not any(index.cells.values())
+    assert index.update(pygame.Rect(100, 512, 16, 16)) == ([], [])
@@ -1,29 +1,33 @@
-import os
-import pygame
-import utils
+from asset_manager import assets
+from animation import animation_clock
 
 
 class Textbox:
     def __init__(self):
         self.font_size = 8
-        self.font = pygame.font.Font(
-            os.path.join(utils.get_resource_path(),
-                         "assets/fonts/Grand9K Pixel.ttf"),
-            self.font_size,
-        )
+        self.font = assets.glyph_atlas(
+            "assets/fonts/Grand9K Pixel.ttf", self.font_size, (0, 0, 0))
+        self.line_height = self.font_size * 2
+        self.text_x = 24
+        self.text_y = 40
         self.char_idx = 0
         self.line_idx = 0
         self.dialogue = []
         self.last_ms = None
         self.acc_ms = 0
         self.delay_ms = 30
-        self.textbox_img = pygame.image.load(os.path.join(
-            utils.get_resource_path(), "assets/images/textbox.png"))
+        self.textbox_img = assets.image("assets/images/textbox.png")
+        self.text_w = self.textbox_img.get_width() - self.text_x * 2
         self.is_visible = False
         self.callback = None
+        self._img = self.textbox_img.copy()
+        self._glyph_positions = []
+        self._revealed_idx = 0
+        # Bumped whenever the image is drawn on, since it's reused in place
+        self.image_version = 0
 
     def update(self):
-        now = pygame.time.get_ticks()
+        now = animation_clock.now_ms
         if self.last_ms == None:
             self.last_ms = now
         self.acc_ms += now - self.last_ms
@@ -41,31 +45,70 @@ class Textbox:
     def move_next_line(self):
         self.line_idx += 1
         self.char_idx = 0
+        self._layout()
 
     def load(self, dialogue, callback):
         self.char_idx = 0
         self.line_idx = 0
         self.dialogue = dialogue
         self.callback = callback
+        self._layout()
 
-    def get_image(self):
-        img = self.textbox_img.copy()
-        if len(self.dialogue) > 0:
-            speaker_img = self.font.render(
-                self.dialogue[self.line_idx]["speaker"],
-                False,
-                (0, 0, 0),
-            )
-            img.blit(speaker_img, (24, 19))
+    def _wrap(self, text):
+        # (start, end) spans of text per line, breaking on "\n" or at the last
+        # space that keeps the line inside the box
+        spans = []
+        line_start = 0
+        last_space = None
+        for idx, c in enumerate(text):
+            if c == "\n":
+                spans.append((line_start, idx))
+                line_start = idx + 1
+                last_space = None
+            elif c == " " and idx == line_start:
+                line_start = idx + 1
+            else:
+                if c == " ":
+                    last_space = idx
+                elif last_space is not None and self.font.size(text[line_start:idx + 1])[0] > self.text_w:
+                    spans.append((line_start, last_space))
+                    line_start = last_space + 1
+                    last_space = None
+        spans.append((line_start, len(text)))
+        return spans
+
+    def _layout(self):
+        # Lay out the whole line once, then typing only blits newly revealed
+        # glyphs from the atlas
+        self._img = self.textbox_img.copy()
+        self._glyph_positions = []
+        self._revealed_idx = 0
+        self.image_version += 1
+        if self.line_idx >= len(self.dialogue):
+            return
+        dialogue_line = self.dialogue[self.line_idx]
+        self.font.blit_text(
+            self._img, dialogue_line["speaker"], (self.text_x, 19))
 
-            texts = self.dialogue[self.line_idx]["text"][:self.char_idx].split(
-                "\n")
-            for idx, text in enumerate(texts):
-                text_img = self.font.render(
-                    text,
-                    False,
-                    (0, 0, 0),
-                )
-                img.blit(text_img, (24, 40 + self.font_size*idx))
+        text = dialogue_line["text"]
+        self._glyph_positions = [None] * len(text)
+        for line_no, (start, end) in enumerate(self._wrap(text)):
+            glyph_x = self.text_x
+            glyph_y = self.text_y + self.line_height * line_no
+            for idx in range(start, end):
+                self._glyph_positions[idx] = (glyph_x, glyph_y)
+                glyph_x += self.font.size(text[idx])[0]
 
-        return img
+    def get_image(self):
+        revealed_idx = min(self.char_idx, len(self._glyph_positions))
+        if self._revealed_idx < revealed_idx:
+            text = self.dialogue[self.line_idx]["text"]
+            blits = []
+            for idx in range(self._revealed_idx, revealed_idx):
+                position = self._glyph_positions[idx]
+                if position is not None:
+                    blits.extend(self.font.get_blits(text[idx], position))
+            self._img.blits(blits, False)
+            self._revealed_idx = revealed_idx
+            self.image_version += 1
+        return self._img
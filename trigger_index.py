@@ -0,0 +1,47 @@
+# Maps are mostly horizontal, so triggers are bucketed by x only
+CELL_W = 256
+
+
+class TriggerIndex:
+    def __init__(self, triggers=(), cell_w=CELL_W):
+        self.cell_w = cell_w
+        self.cells = {}
+        self._order = {}
+        self._next_order = 0
+        self.overlapping = set()
+        for trigger in triggers:
+            self.add(trigger)
+
+    def _get_cell_range(self, rect):
+        return range(rect.left // self.cell_w, (rect.right - 1) // self.cell_w + 1)
+
+    def add(self, trigger):
+        # Insertion order is kept so queries return hits in the same order
+        # a sprite group scan would
+        self._order[trigger] = self._next_order
+        self._next_order += 1
+        for cell_x in self._get_cell_range(trigger.rect):
+            self.cells.setdefault(cell_x, []).append(trigger)
+
+    def remove(self, trigger):
+        for cell_x in self._get_cell_range(trigger.rect):
+            self.cells[cell_x].remove(trigger)
+        del self._order[trigger]
+        self.overlapping.discard(trigger)
+
+    def query(self, rect):
+        hits = set()
+        for cell_x in self._get_cell_range(rect):
+            for trigger in self.cells.get(cell_x, ()):
+                if trigger.rect.colliderect(rect):
+                    hits.add(trigger)
+        return sorted(hits, key=self._order.get)
+
+    def update(self, rect):
+        # Returns (entered, exited) triggers since the last update
+        hits = self.query(rect)
+        overlapping = set(hits)
+        entered = [trigger for trigger in hits if trigger not in self.overlapping]
+        exited = sorted(self.overlapping - overlapping, key=self._order.get)
+        self.overlapping = overlapping
+        return entered, exited
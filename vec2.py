@@ -20,3 +20,14 @@ def scale(v, s):
 def normalize(v):
     m = magnitude(v)
     return scale(v, 1/m)
+
+
+def lerp(v1, v2, t):
+    v1_x, v1_y = v1
+    v2_x, v2_y = v2
+    return (v1_x + (v2_x - v1_x)*t, v1_y + (v2_y - v1_y)*t)
+
+
+def rounded(v):
+    v_x, v_y = v
+    return (round(v_x), round(v_y))